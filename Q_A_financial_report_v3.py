@@ -9,26 +9,132 @@ import pandas as pd
 import numpy as np
 from datetime import datetime, timedelta
 import openpyxl
-from openpyxl.styles import Font, Alignment, PatternFill, Border, Side
 from openpyxl.utils import get_column_letter
 import logging
 import schedule
 import time
 import os
 import sys # Import sys module
+import json
+import re
+import socket
+from concurrent.futures import ThreadPoolExecutor
+from financial_metrics import (PERCENT_METRICS, PER_SHARE_METRICS, WORKING_CAPITAL_METRICS, MISSING, UNDEFINED,
+                               STATE_LABELS,
+                               compute_metric_panel, period_metrics, peer_statistics, trailing_twelve_months)
+from report_rendering import PlanWorksheet, register_report_styles, render_plan, render_plans
+from data_quality import assess_quality, combine_quality, log_quality
+from fx_rates import FxRateTable
+from covenants import CovenantMonitor
+from filing_calendar import FilingScheduler, load_filing_calendar
+from work_queue import WorkQueue, READY, LEASED
+from batch_journal import BatchJournal, DONE, SKIPPED
+from circuit_breaker import CircuitBreaker, CLOSED
+import tracing
+from profiling import profile_call
+from report_server import ReportServer, DEFAULT_ADDRESS, KEY_VARIABLE, parse_address, submit
+from period_alignment import (align_statements, fiscal_frequency, fiscal_labels, fiscal_year_end,
+                              load_fiscal_calendar, log_empty_periods)
 
 # Set up logging
 logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
 logger = logging.getLogger(__name__)
 
+# Derived rows as Excel formulas over input rows: (section, expression, style).
+# {Field} placeholders are replaced by the cell holding that field in the same column;
+# fields wrapped in N() are optional, every other input must hold a number.
+DERIVED_FORMULAS = {
+    "Working Capital": ('balance_sheet', "{Current Assets}-{Current Liabilities}", 'currency'),
+    "Net Worth (OE)": ('balance_sheet', "{Total Assets}-{Total Liabilities Net Minority Interest}", 'currency'),
+    "Current Ratio": ('balance_sheet', 'IF({Current Liabilities}=0,"n/m",{Current Assets}/{Current Liabilities})', 'ratio'),
+    "Quick Ratio": ('balance_sheet', 'IF({Current Liabilities}=0,"n/m",({Current Assets}-N({Inventory}))/{Current Liabilities})', 'ratio'),
+    "Debt to Equity Ratio": ('balance_sheet', 'IF({Total Assets}-{Total Liabilities Net Minority Interest}=0,"n/m",'
+                             '{Total Liabilities Net Minority Interest}/({Total Assets}-{Total Liabilities Net Minority Interest}))', 'ratio'),
+    "Gross Profit Margin": ('income', 'IF({Total Revenue}=0,"n/m",{Gross Profit}/{Total Revenue})', 'margin'),
+    "EBIT Margin": ('income', 'IF({Total Revenue}=0,"n/m",{EBIT}/{Total Revenue})', 'margin'),
+    "Net Income Margin": ('income', 'IF({Total Revenue}=0,"n/m",{Net Income}/{Total Revenue})', 'margin'),
+    "Net Cash Flow": ('cashflow', "{Operating Cash Flow}+{Investing Cash Flow}+{Financing Cash Flow}", 'currency'),
+}
+
+# (value columns, Δ% columns) for the quarterly, annual and TTM column sets
+FORMULA_COLUMN_SETS = [
+    (['E', 'G', 'I'], ['F', 'H']),
+    (['K', 'M', 'O'], ['L', 'N']),
+    (['Q', 'S', 'U'], ['R', 'T']),
+]
+PERIOD_TYPES = ['quarterly', 'annual', 'ttm']
+
+# Months covered by one period of each type
+PERIOD_MONTHS = {'quarterly': 3, 'annual': 12, 'ttm': 12}
+
+# Optional analytics sections: name -> (title, [(metric, style), ...]); always written as values
+ANALYTICS_SECTIONS = {
+    'per_share': ("Per Share Data:", [(metric, 'per_share') for metric in PER_SHARE_METRICS]),
+    'cash': ("Cash Analytics:", [
+        ("Free Cash Flow", 'currency'),
+        ("FCF Margin", 'margin'),
+        ("Cash Conversion", 'ratio'),
+        ("Capex Intensity", 'margin'),
+        ("Cash Runway (Months)", 'ratio'),
+    ]),
+    'working_capital': ("Working Capital Cycle:", [(metric, 'days') for metric in WORKING_CAPITAL_METRICS]),
+    'credit': ("Leverage and Coverage:", [
+        ("Interest Coverage", 'ratio'),
+        ("EBITDA", 'currency'),
+        ("Net Debt", 'currency'),
+        ("Debt / EBITDA", 'ratio'),
+        ("Net Debt / EBITDA", 'ratio'),
+        ("Total Debt / Capital", 'margin'),
+    ]),
+}
+ANALYTICS_STYLES = {metric: style for _, metrics in ANALYTICS_SECTIONS.values() for metric, style in metrics}
+
+# What --profile attributes time and memory to: the metric calculation paths that replaced the
+# _calculate_* helpers (period_metrics, trailing_twelve_months, the metric cells) and the stages around them
+PROFILED_METHODS = [
+    'fetch_all_data', 'align_periods', 'compute_ttm_data', 'compute_period_metrics', '_write_report',
+    '_add_statement_row', '_add_metric_values', '_calculate_pct_change', 'build_row_plan', 'create_excel_report',
+]
+PROFILED_FUNCTIONS = ['period_metrics', 'trailing_twelve_months']
+
+# Generator state set by fetch_all_data, checkpointed by batch journals
+FETCHED_ATTRIBUTES = [
+    'quarterly_balance_sheet', 'quarterly_income', 'quarterly_cashflow',
+    'annual_balance_sheet', 'annual_income', 'annual_cashflow',
+    'period_flags', 'fiscal_year_end', 'currency',
+]
+
 class TeslaFinancialReportGenerator:
     """Generates financial reports for Tesla with quarterly and annual data"""
 
-    def __init__(self, ticker="TSLA", output_file="tesla_financial_report.xlsx"):
+    def __init__(self, ticker="TSLA", output_file="tesla_financial_report.xlsx", peer_stats=None,
+                 use_formulas=False, template_path=None, min_quality=None, fx_rates=None, sections=(),
+                 breaker=None):
         self.ticker = ticker
         self.output_file = output_file
         self.yf_ticker = yf.Ticker(ticker)
 
+        # Peer group statistics computed across the whole universe (optional)
+        self.peer_stats = peer_stats
+
+        # Write derived rows and Δ% columns as live Excel formulas
+        self.use_formulas = use_formulas
+        self.layout_rows = {}
+        self._pending_formulas = []
+
+        # Pre-styled template workbook to fill instead of styling from code
+        self.template_path = template_path
+
+        # Optional analytics sections to add (keys of ANALYTICS_SECTIONS)
+        self.sections = [section for section in ANALYTICS_SECTIONS if section in sections]
+
+        # Values are written in thousands (the "In Thousands" divisor cells)
+        self.unit_divisor = 1000
+
+        # Reports are not rendered when the data-quality score (0-100) falls below this
+        self.min_quality = min_quality
+        self.data_quality = None
+
         # Fetch all financial data
         self.quarterly_balance_sheet = None
         self.annual_balance_sheet = None
@@ -37,62 +143,235 @@ class TeslaFinancialReportGenerator:
         self.quarterly_cashflow = None
         self.annual_cashflow = None
 
+        # Periods (rows) x sections (columns), True where a statement has no data
+        self.period_flags = {}
+
+        # Month the fiscal year ends in (from the fiscal calendar table or the annual dates)
+        self.fiscal_year_end = 12
+
+        # FX rate table converting statements into its reporting currency (optional)
+        self.fx_rates = fx_rates
+        self.currency = "USD"
+        self.reporting_currency = fx_rates.reporting_currency if fx_rates else "USD"
+
+        # Circuit breaker shared by every fetch from the data provider (optional)
+        self.breaker = breaker
+        # True when the last fetch was refused by the open breaker without calling the provider
+        self.fetch_rejected = False
+
+    def fetched_state(self):
+        """Fetched (aligned and converted) statements and what was derived while fetching"""
+        return {attribute: getattr(self, attribute) for attribute in FETCHED_ATTRIBUTES}
+
+    def restore_state(self, state):
+        """Restore statements checkpointed with ``fetched_state`` instead of fetching them"""
+        for attribute in FETCHED_ATTRIBUTES:
+            setattr(self, attribute, state[attribute])
+
     def fetch_all_data(self):
         """Fetch all financial data from yfinance"""
+        self.fetch_rejected = self.breaker is not None and not self.breaker.allow()
+        if self.fetch_rejected:
+            # Fail fast while the provider is failing; the breaker logs its state changes
+            logger.debug(f"Data provider circuit open, not fetching {self.ticker}")
+            return False
+
         logger.info(f"Fetching financial data for {self.ticker}...")
 
         try:
-            # Fetch quarterly data
-            self.quarterly_balance_sheet = self.yf_ticker.quarterly_balance_sheet
-            self.quarterly_income = self.yf_ticker.quarterly_income_stmt
-            self.quarterly_cashflow = self.yf_ticker.quarterly_cash_flow
+            with tracing.span("fetch", ticker=self.ticker):
+                # Fetch quarterly data
+                self.quarterly_balance_sheet = self.yf_ticker.quarterly_balance_sheet
+                self.quarterly_income = self.yf_ticker.quarterly_income_stmt
+                self.quarterly_cashflow = self.yf_ticker.quarterly_cash_flow
+
+                # Fetch annual data
+                self.annual_balance_sheet = self.yf_ticker.balance_sheet
+                self.annual_income = self.yf_ticker.income_stmt
+                self.annual_cashflow = self.yf_ticker.cash_flow
+
+                # The statements' currency is only known from the company profile
+                if self.fx_rates is not None:
+                    self.currency = (self.yf_ticker.info or {}).get('financialCurrency') or self.reporting_currency
+
+            # The provider answers errors with empty statements as often as with exceptions
+            if all(frame is None or frame.empty for frame in self.statement_frames('quarterly').values()) and \
+                    all(frame is None or frame.empty for frame in self.statement_frames('annual').values()):
+                raise ValueError("no statements returned")
 
-            # Fetch annual data
-            self.annual_balance_sheet = self.yf_ticker.balance_sheet
-            self.annual_income = self.yf_ticker.income_stmt
-            self.annual_cashflow = self.yf_ticker.cash_flow
+        except Exception as e:
+            logger.error(f"Error fetching financial data: {e}")
+            if self.breaker is not None:
+                self.breaker.record(False)
+            return False
 
-            logger.info("Successfully fetched all financial data")
-            return True
+        # Only the provider's answers count towards the breaker, not errors processing them here
+        if self.breaker is not None:
+            self.breaker.record(True)
+
+        try:
+            # Statements share one period index from here on
+            with tracing.span("align", ticker=self.ticker):
+                self.align_periods()
+
+            if self.fx_rates is not None:
+                with tracing.span("convert", ticker=self.ticker):
+                    self.normalize_currency()
 
         except Exception as e:
-            logger.error(f"Error fetching financial data: {e}")
+            logger.error(f"Error processing financial data for {self.ticker}: {e}")
             return False
 
+        logger.info("Successfully fetched all financial data")
+        return True
+
+    def align_periods(self):
+        """Reindex the statements of each period type to one shared, non-empty fiscal period index"""
+        self.fiscal_year_end = fiscal_year_end(self.ticker, self.statement_frames('annual').values())
+
+        for period_type in ('quarterly', 'annual'):
+            aligned, self.period_flags[period_type] = align_statements(self.statement_frames(period_type),
+                                                                       self.fiscal_frequency(period_type))
+            self._set_statement_frames(period_type, aligned)
+            log_empty_periods(self.ticker, period_type, self.period_flags[period_type])
+
+    def normalize_currency(self):
+        """Convert the statements into the reporting currency of the FX rate table"""
+        if self.currency == self.reporting_currency:
+            return
+
+        logger.info(f"Converting {self.ticker} statements from {self.currency} to {self.reporting_currency}")
+        for period_type in ('quarterly', 'annual'):
+            converted = self.fx_rates.convert_statements(self.statement_frames(period_type), self.currency,
+                                                         period_type)
+            self._set_statement_frames(period_type, converted)
+
+    def fiscal_frequency(self, period_type):
+        """Period frequency of a period type anchored to the ticker's fiscal year end"""
+        return fiscal_frequency(period_type, self.fiscal_year_end)
+
+    def statement_frames(self, period_type='quarterly'):
+        """Fetched statements of one period type keyed by report section"""
+        if period_type == 'annual':
+            return {'balance_sheet': self.annual_balance_sheet, 'income': self.annual_income,
+                    'cashflow': self.annual_cashflow}
+
+        return {'balance_sheet': self.quarterly_balance_sheet, 'income': self.quarterly_income,
+                'cashflow': self.quarterly_cashflow}
+
+    def assess_data_quality(self):
+        """Score the fetched statements on accounting identities and field coverage"""
+        self.data_quality = combine_quality([
+            assess_quality({self.ticker: self.statement_frames('quarterly')}),
+            assess_quality({self.ticker: self.statement_frames('annual')}),
+        ])
+        log_quality(self.data_quality, self.min_quality)
+
+        return self.data_quality
+
+    def passes_quality_gate(self):
+        """Check the data-quality score against the minimum before rendering"""
+        quality = self.assess_data_quality()
+        if self.min_quality is None:
+            return True
+
+        return quality.at[self.ticker, 'Quality Score'] >= self.min_quality
+
+    def _set_statement_frames(self, period_type, frames):
+        """Replace the statements of one period type from a {section: frame} dict"""
+        if period_type == 'annual':
+            self.annual_balance_sheet = frames['balance_sheet']
+            self.annual_income = frames['income']
+            self.annual_cashflow = frames['cashflow']
+        else:
+            self.quarterly_balance_sheet = frames['balance_sheet']
+            self.quarterly_income = frames['income']
+            self.quarterly_cashflow = frames['cashflow']
+
+    def compute_ttm_data(self):
+        """Compute trailing-twelve-month frames from the quarterly statements"""
+        # Flow statements are summed over four fiscal quarters, balances are averaged
+        freq = self.fiscal_frequency('quarterly')
+        self.ttm_balance_sheet = trailing_twelve_months(self.quarterly_balance_sheet, stock=True, freq=freq)
+        self.ttm_income = trailing_twelve_months(self.quarterly_income, freq=freq)
+        self.ttm_cashflow = trailing_twelve_months(self.quarterly_cashflow, freq=freq)
+
+    def compute_period_metrics(self):
+        """Derived metrics with their zero/missing/undefined states for every period type"""
+        # TTM periods are spaced by fiscal quarters
+        frequencies = {'quarterly': self.fiscal_frequency('quarterly'), 'annual': self.fiscal_frequency('annual'),
+                       'ttm': self.fiscal_frequency('quarterly')}
+        self.period_metrics = {
+            # TTM balances are already four-quarter averages
+            period_type: period_metrics(*self._section_frames(period_type).values(), PERIOD_MONTHS[period_type],
+                                        average_balances=period_type != 'ttm', freq=frequencies[period_type])
+            for period_type in PERIOD_TYPES
+        }
+
+    def _section_frames(self, period_type):
+        """Statements of one period type (quarterly, annual or TTM) keyed by report section"""
+        if period_type == 'ttm':
+            return {'balance_sheet': self.ttm_balance_sheet, 'income': self.ttm_income,
+                    'cashflow': self.ttm_cashflow}
+
+        return self.statement_frames(period_type)
+
     def create_excel_report(self):
         """Create Excel report with quarterly and annual data"""
+        if self.template_path:
+            # Only values are filled; styles, merges and widths come from the template
+            render_plan(self.build_row_plan(), self.output_file, self.template_path)
+            logger.info(f"Report saved as {self.output_file} (template {self.template_path})")
+            return
+
         wb = openpyxl.Workbook()
         ws = wb.active
         ws.title = "Sheet1"
 
-        # Define styles
-        header_font = Font(bold=True, size=14)
-        subheader_font = Font(bold=True, size=12)
-        bold_font = Font(bold=True)
+        # Named styles are created once per workbook and applied by reference
+        register_report_styles(wb, self.reporting_currency)
+        with tracing.span("render", ticker=self.ticker):
+            self._write_report(ws)
+
+        # Save the workbook
+        with tracing.span("save", ticker=self.ticker, output=self.output_file):
+            wb.save(self.output_file)
+        logger.info(f"Report saved as {self.output_file}")
 
-        # Title
+    def build_row_plan(self):
+        """Lay out the report into a serializable row plan for a render worker"""
+        ws = PlanWorksheet()
+        with tracing.span("plan", ticker=self.ticker):
+            self._write_report(ws)
+
+        plan = ws.to_plan()
+        plan['currency'] = self.reporting_currency
+        plan['ticker'] = self.ticker
+        return plan
+
+    def _write_report(self, ws):
+        """Write the report layout to a worksheet (or a PlanWorksheet)"""
+        with tracing.span("compute", ticker=self.ticker):
+            self.compute_ttm_data()
+            self.compute_period_metrics()
+        self.layout_rows = {'balance_sheet': {}, 'income': {}, 'cashflow': {}}
+        self._pending_formulas = []
+
+        # Title (styles come from the workbook's named style registry)
         ws['A1'] = "FINANCIAL STATEMENTS"
-        ws['A1'].font = Font(bold=True, size=16)
+        ws['A1'].style = 'title'
         ws.merge_cells('A1:O1')
-        ws['A1'].alignment = Alignment(horizontal='center')
 
         # Balance Sheet Section
         ws['A3'] = "Balance Sheet Data:"
-        ws['A3'].font = header_font
+        ws['A3'].style = 'header'
 
         # Headers setup
         ws['B5'] = "In Thousands"
-        ws['C5'] = 1000
+        ws['C5'] = self.unit_divisor
 
-        # Quarterly headers
-        ws['E5'] = "Q"
-        ws['G5'] = "Q"
-        ws['I5'] = "Q"
-
-        # Annual headers - changed 1/7/2025
-        ws['K5'] = f"FY {datetime.now().year-1}"
-        ws['M5'] = f"FY {datetime.now().year-2}"
-        ws['O5'] = f"FY {datetime.now().year-3}"
+        # Fiscal quarter and year headers
+        self._add_period_labels(ws, 5)
 
         # Get dates for quarters
         if self.quarterly_balance_sheet is not None and len(self.quarterly_balance_sheet.columns) >= 3:
@@ -108,14 +387,19 @@ class TeslaFinancialReportGenerator:
             ws['M6'] = a_dates[1].strftime('%m/%d/%Y')
             ws['O6'] = a_dates[2].strftime('%m/%d/%Y')
 
+        # Trailing-twelve-month headers
+        self._add_ttm_headers(ws, 5, 6)
+
         # Assets header
         ws['B7'] = "Assets:"
-        ws['B7'].font = subheader_font
+        ws['B7'].style = 'subheader'
         ws['F7'] = "Δ%"
         ws['H7'] = "Δ%"
         ws['J7'] = "Δ%"
         ws['L7'] = "Δ%"
         ws['N7'] = "Δ%"
+        ws['R7'] = "Δ%"
+        ws['T7'] = "Δ%"
 
         # Balance Sheet Items
         row = 8
@@ -124,22 +408,14 @@ class TeslaFinancialReportGenerator:
         # Income Statement Section
         row = 31
         ws[f'A{row}'] = "Income Statement:"
-        ws[f'A{row}'].font = header_font
+        ws[f'A{row}'].style = 'header'
 
         # Headers setup for income sheet
         ws['B33'] = "In Thousands"
-        ws['C33'] = 1000
-
-        # Quarterly headers for income sheet
-        ws['E32'] = "Q"
-        ws['G32'] = "Q"
-        ws['I32'] = "Q"
+        ws['C33'] = self.unit_divisor
 
-        # Income Statement headers
-        row = 32
-        ws[f'K{row}'] = f"FY {datetime.now().year-1}"
-        ws[f'M{row}'] = f"FY {datetime.now().year-2}"
-        ws[f'O{row}'] = f"FY {datetime.now().year-3}"
+        # Fiscal quarter and year headers for income sheet
+        self._add_period_labels(ws, 32)
 
         # Get dates for quarters income sheet
         if self.quarterly_income is not None and len(self.quarterly_income.columns) >= 3:
@@ -154,12 +430,16 @@ class TeslaFinancialReportGenerator:
             ws['K33'] = a_dates[0].strftime('%m/%d/%Y')
             ws['M33'] = a_dates[1].strftime('%m/%d/%Y')
             ws['O33'] = a_dates[2].strftime('%m/%d/%Y')
+
+        self._add_ttm_headers(ws, 32, 33)
         # Delta change for income sheet
         ws['F34'] = "Δ%"
         ws['H34'] = "Δ%"
         ws['J34'] = "Δ%"
         ws['L34'] = "Δ%"
         ws['N34'] = "Δ%"
+        ws['R34'] = "Δ%"
+        ws['T34'] = "Δ%"
 
         row = 35
         self._add_income_statement_items(ws, row)
@@ -167,22 +447,14 @@ class TeslaFinancialReportGenerator:
         # Cash Flow Section
         row = 56
         ws[f'A{row}'] = "Cash Flows:"
-        ws[f'A{row}'].font = header_font
+        ws[f'A{row}'].style = 'header'
 
         # Headers setup for Cash flow
         ws['B58'] = "In Thousands"
-        ws['C58'] = 1000
-
-        # Quarterly headers for Cash flow
-        ws['E57'] = "Q"
-        ws['G57'] = "Q"
-        ws['I57'] = "Q"
+        ws['C58'] = self.unit_divisor
 
-        # Cash Flow headers
-        row = 57
-        ws[f'K{row}'] = f"FY {datetime.now().year-1}"
-        ws[f'M{row}'] = f"FY {datetime.now().year-2}"
-        ws[f'O{row}'] = f"FY {datetime.now().year-3}"
+        # Fiscal quarter and year headers for Cash flow
+        self._add_period_labels(ws, 57)
 
          # Get dates for quarters Cashflow
         if self.quarterly_cashflow is not None and len(self.quarterly_cashflow.columns) >= 3:
@@ -198,14 +470,31 @@ class TeslaFinancialReportGenerator:
             ws['M58'] = a_dates[1].strftime('%m/%d/%Y')
             ws['O58'] = a_dates[2].strftime('%m/%d/%Y')
 
+        self._add_ttm_headers(ws, 57, 58)
+
         ws['F63'] = "Δ%"
         ws['H63'] = "Δ%"
         ws['J63'] = "Δ%"
         ws['L63'] = "Δ%"
         ws['N63'] = "Δ%"
+        ws['R63'] = "Δ%"
+        ws['T63'] = "Δ%"
 
         row = 62
-        self._add_cash_flow_items(ws, row)
+        row = self._add_cash_flow_items(ws, row)
+
+        # Derived rows reference inputs anywhere in the layout
+        self._add_formula_rows(ws)
+
+        # Analytics Sections (optional)
+        for section in self.sections:
+            row += 4
+            row = self._add_analytics_items(ws, row, section)
+
+        # Peer Comparison Section
+        if self.peer_stats is not None:
+            row += 4
+            self._add_peer_comparison_items(ws, row)
 
         # Set column widths
         ws.column_dimensions['A'].width = 2
@@ -223,10 +512,12 @@ class TeslaFinancialReportGenerator:
         ws.column_dimensions['M'].width = 15
         ws.column_dimensions['N'].width = 10
         ws.column_dimensions['O'].width = 15
-
-        # Save the workbook
-        wb.save(self.output_file)
-        logger.info(f"Report saved as {self.output_file}")
+        ws.column_dimensions['P'].width = 2
+        ws.column_dimensions['Q'].width = 15
+        ws.column_dimensions['R'].width = 10
+        ws.column_dimensions['S'].width = 15
+        ws.column_dimensions['T'].width = 10
+        ws.column_dimensions['U'].width = 15
 
     def _add_balance_sheet_items(self, ws, start_row):
         """Add balance sheet items to the worksheet"""
@@ -248,15 +539,11 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name and field_name != "Working Capital":
-                # Add quarterly data
-                self._add_quarterly_data(ws, row, self.quarterly_balance_sheet, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-
-                # Add annual data
-                self._add_annual_data(ws, row, self.annual_balance_sheet, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'balance_sheet', field_name)
 
             elif item_name == "Working Capital":
                 # Calculate Working Capital = Current Assets - Current Liabilities
-                self._calculate_working_capital(ws, row)
+                self._add_derived_row(ws, row, "Working Capital")
 
             row += 1
 
@@ -265,7 +552,7 @@ class TeslaFinancialReportGenerator:
 
         # Liabilities section
         ws[f'B{row}'] = "Liabilities:"
-        ws[f'B{row}'].font = Font(bold=True)
+        ws[f'B{row}'].style = 'label'
         row += 1
 
         liability_items = [
@@ -282,14 +569,10 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name and field_name != "Net Worth (OE)":
-                # Add quarterly data
-                self._add_quarterly_data(ws, row, self.quarterly_balance_sheet, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-
-                # Add annual data
-                self._add_annual_data(ws, row, self.annual_balance_sheet, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'balance_sheet', field_name)
             elif item_name == "Net Worth (OE)":
                 # NetWorth = Total Assets - total Liabilities
-                self._calculate_networth(ws, row)
+                self._add_derived_row(ws, row, "Net Worth (OE)")
 
 
             row += 1
@@ -297,21 +580,21 @@ class TeslaFinancialReportGenerator:
         # Add financial ratios
         row += 2
         ws[f'B{row}'] = ":"
-        ws[f'B{row}'].font = Font(bold=True)
+        ws[f'B{row}'].style = 'label'
 
         # Current Ratio
         ws[f'C{row}'] = "Current Ratio"
-        self._calculate_current_ratio(ws, row)
+        self._add_derived_row(ws, row, "Current Ratio")
         row += 1
 
         # Quick Ratio
         ws[f'C{row}'] = "Quick Ratio"
-        self._calculate_quick_ratio(ws, row)
+        self._add_derived_row(ws, row, "Quick Ratio")
         row += 1
 
         # Debt to Equity Ratio
         ws[f'C{row}'] = "Debt to Equity Ratio"
-        self._calculate_Debt_to_Equity(ws, row)
+        self._add_derived_row(ws, row, "Debt to Equity Ratio")
 
         return row
 
@@ -342,21 +625,17 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name and field_name != "Gross_Profit_Margin" and field_name != "EBIT_Margin" and field_name != "Net Income Margin":
-                # Add quarterly data
-                self._add_quarterly_data(ws, row, self.quarterly_income, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-
-                # Add annual data
-                self._add_annual_data(ws, row, self.annual_income, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'income', field_name)
 
             elif item_name == "Gross_Profit_Margin":
                 # Calculate Gross Margin = Gross Profit / Revenue
-                self._calculate_gross_profit_margin(ws, row)
+                self._add_derived_row(ws, row, "Gross Profit Margin")
             elif item_name == "EBIT_Margin":
                 # Calculate EBIT Margin = EBIT / Revenue
-                self._calculate_ebit_margin(ws, row)
+                self._add_derived_row(ws, row, "EBIT Margin")
             elif item_name == "Net Income Margin":
                 # Calculate Net Income Margin = Net Income / Revenue
-                self._calculate_net_income_margin(ws, row)
+                self._add_derived_row(ws, row, "Net Income Margin")
 
             row += 1
 
@@ -368,7 +647,7 @@ class TeslaFinancialReportGenerator:
 
         # Operating Activities
         ws[f'B{row}'] = "Cash Flows-Operating Activities:"
-        ws[f'B{row}'].font = Font(bold=True)
+        ws[f'B{row}'].style = 'label'
         row += 1
 
         operating_items = [
@@ -385,20 +664,18 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name:
-                self._add_quarterly_data(ws, row, self.quarterly_cashflow, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-                self._add_annual_data(ws, row, self.annual_cashflow, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'cashflow', field_name)
 
             row += 1
 
         # Net Cash Flow-Operating
         ws[f'B{row}'] = "Net Cash Flow-Operating"
-        self._add_quarterly_data(ws, row, self.quarterly_cashflow, "Operating Cash Flow", 'E', 'F', 'G', 'H', 'I', 'J')
-        self._add_annual_data(ws, row, self.annual_cashflow, "Operating Cash Flow", 'K', 'L', 'M', 'N', 'O')
+        self._add_statement_row(ws, row, 'cashflow', "Operating Cash Flow")
         row += 2
 
         # Investing Activities
         ws[f'B{row}'] = "Cash Flows-Investing Activities:"
-        ws[f'B{row}'].font = Font(bold=True)
+        ws[f'B{row}'].style = 'label'
         row += 1
 
         investing_items = [
@@ -411,20 +688,18 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name:
-                self._add_quarterly_data(ws, row, self.quarterly_cashflow, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-                self._add_annual_data(ws, row, self.annual_cashflow, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'cashflow', field_name)
 
             row += 1
 
         # Net Cash Flows-Investing
         ws[f'B{row}'] = "Net Cash Flows-Investing"
-        self._add_quarterly_data(ws, row, self.quarterly_cashflow, "Investing Cash Flow", 'E', 'F', 'G', 'H', 'I', 'J')
-        self._add_annual_data(ws, row, self.annual_cashflow, "Investing Cash Flow", 'K', 'L', 'M', 'N', 'O')
+        self._add_statement_row(ws, row, 'cashflow', "Investing Cash Flow")
         row += 2
 
         # Financing Activities
         ws[f'B{row}'] = "Cash Flows-Financing Activities:"
-        ws[f'B{row}'].font = Font(bold=True)
+        ws[f'B{row}'].style = 'label'
         row += 1
 
         financing_items = [
@@ -439,425 +714,337 @@ class TeslaFinancialReportGenerator:
             ws[f'C{row}'] = item_name
 
             if field_name:
-                self._add_quarterly_data(ws, row, self.quarterly_cashflow, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
-                self._add_annual_data(ws, row, self.annual_cashflow, field_name, 'K', 'L', 'M', 'N', 'O')
+                self._add_statement_row(ws, row, 'cashflow', field_name)
 
             row += 1
 
         # Net Cash Flows-Financing
         ws[f'B{row}'] = "Net Cash Flows-Financing"
-        self._add_quarterly_data(ws, row, self.quarterly_cashflow, "Financing Cash Flow", 'E', 'F', 'G', 'H', 'I', 'J')
-        self._add_annual_data(ws, row, self.annual_cashflow, "Financing Cash Flow", 'K', 'L', 'M', 'N', 'O')
+        self._add_statement_row(ws, row, 'cashflow', "Financing Cash Flow")
         row += 2
 
         # Net Cash Flow
         ws[f'B{row}'] = "Net Cash Flow"
-        self._calculate_net_cash_flow(ws, row)
+        self._add_derived_row(ws, row, "Net Cash Flow")
 
         return row
 
-    def _add_quarterly_data(self, ws, row, dataframe, field_name, col1, col2, col3, col4, col5, col6):
-        """Add quarterly data with percentage changes"""
-        if dataframe is None or field_name not in dataframe.index:
+    def _add_statement_row(self, ws, row, section, field_name):
+        """Add quarterly, annual and TTM values of one statement field"""
+        quarterly, annual, ttm = {
+            'balance_sheet': (self.quarterly_balance_sheet, self.annual_balance_sheet, self.ttm_balance_sheet),
+            'income': (self.quarterly_income, self.annual_income, self.ttm_income),
+            'cashflow': (self.quarterly_cashflow, self.annual_cashflow, self.ttm_cashflow),
+        }[section]
+
+        # Remember where each input lands so formulas can reference it
+        self.layout_rows[section][field_name] = row
+
+        self._add_quarterly_data(ws, row, quarterly, field_name, 'E', 'F', 'G', 'H', 'I', 'J')
+        self._add_annual_data(ws, row, annual, field_name, 'K', 'L', 'M', 'N', 'O')
+        self._add_quarterly_data(ws, row, ttm, field_name, 'Q', 'R', 'S', 'T', 'U', 'V')
+
+    def _add_derived_row(self, ws, row, metric):
+        """Add a calculated row, as live formulas in formula mode or as computed values"""
+        if self.use_formulas:
+            # Written once the whole layout is known, since inputs may sit below
+            self._pending_formulas.append((row, metric))
             return
 
-        try:
-            values = dataframe.loc[field_name].values[:3]
+        for period_type, (value_cols, pct_cols) in zip(PERIOD_TYPES, FORMULA_COLUMN_SETS):
+            self._add_metric_values(ws, row, metric, period_type, value_cols, pct_cols)
 
-            # Add values
-            ws[f'{col1}{row}'] = self._format_currency(values[0])
-            ws[f'{col3}{row}'] = self._format_currency(values[1])
-            ws[f'{col5}{row}'] = self._format_currency(values[2])
+    def _add_formula_rows(self, ws):
+        """Write pending derived rows as Excel formulas over the input rows"""
+        for row, metric in self._pending_formulas:
+            section, expression, style = DERIVED_FORMULAS[metric]
+            required = re.findall(r'(?<!N\()\{([^}]+)\}', expression)
 
-            # Calculate and add percentage changes
-            if len(values) >= 2:
-                pct_change1 = self._calculate_pct_change(values[0], values[1])
-                ws[f'{col2}{row}'] = pct_change1
-                ws[f'{col2}{row}'].number_format = '0.00%' if abs(pct_change1) < 10 else '0.0'
+            try:
+                for value_cols, pct_cols in FORMULA_COLUMN_SETS:
+                    for col in value_cols:
+                        refs = {field: f'{col}{field_row}' for field, field_row in self.layout_rows[section].items()}
+                        inputs = ",".join(sorted({refs[field] for field in required}))
+
+                        # Inputs without a number (blank or "n/a") make the result missing
+                        ws[f'{col}{row}'] = (f'=IF(COUNT({inputs})<{len(set(required))},"{STATE_LABELS[MISSING]}",'
+                                             + expression.format_map(refs) + ')')
+                        ws[f'{col}{row}'].style = style
+
+                    # Δ% only makes sense for amounts, not for ratios and margins
+                    if style == 'currency':
+                        for i, pct_col in enumerate(pct_cols):
+                            self._add_pct_change(ws, f'{pct_col}{row}', None, None,
+                                                 f'{value_cols[i]}{row}', f'{value_cols[i+1]}{row}')
+
+            except KeyError as e:
+                logger.warning(f"Error writing {metric} formula, input row {e} not in layout")
+
+    def _add_pct_change(self, ws, coordinate, current, previous, current_cell, previous_cell):
+        """Add a Δ% cell, as a live formula in formula mode or as a computed value"""
+        if self.use_formulas:
+            ws[coordinate] = (f'=IF(COUNT({current_cell},{previous_cell})<2,"{STATE_LABELS[MISSING]}",'
+                              f'IF({previous_cell}=0,"{STATE_LABELS[UNDEFINED]}",'
+                              f'({current_cell}-{previous_cell})/ABS({previous_cell})))')
+            ws[coordinate].style = 'percent'
+            return
 
-            if len(values) >= 3:
-                pct_change2 = self._calculate_pct_change(values[1], values[2])
-                ws[f'{col4}{row}'] = pct_change2
-                ws[f'{col4}{row}'].number_format = '0.00%' if abs(pct_change2) < 10 else '0.0'
+        if pd.isna(current) or pd.isna(previous):
+            self._write_state(ws, coordinate, MISSING)
+            return
+        if previous == 0:
+            self._write_state(ws, coordinate, UNDEFINED)
+            return
 
-        except Exception as e:
-            logger.warning(f"Error adding quarterly data for {field_name}: {e}")
+        pct_change = self._calculate_pct_change(current, previous)
+        ws[coordinate] = pct_change
+        ws[coordinate].style = 'percent' if abs(pct_change) < 10 else 'percent_large'
+
+    def _add_period_labels(self, ws, label_row):
+        """Add fiscal period labels (Q1 FY 2025, FY 2024) above the quarterly and annual dates"""
+        # Statements are period-aligned, so every section shares these labels
+        for period_type, columns in (('quarterly', ['E', 'G', 'I']), ('annual', ['K', 'M', 'O'])):
+            frame = self.statement_frames(period_type)['balance_sheet']
+            if frame is None:
+                continue
+
+            labels = fiscal_labels(frame.columns[:len(columns)], self.fiscal_frequency(period_type))
+            for col, label in zip(columns, labels):
+                ws[f'{col}{label_row}'] = label
+
+    def _add_ttm_headers(self, ws, label_row, date_row):
+        """Add TTM column headers for the latest three trailing periods"""
+        if self.ttm_income is None or len(self.ttm_income.columns) < 3:
+            return
 
-    def _add_annual_data(self, ws, row, dataframe, field_name, col1, col2, col3, col4, col5):
-        """Add annual data with percentage changes"""
-        if dataframe is None or field_name not in dataframe.index:
+        t_dates = self.ttm_income.columns[:3]
+        for col, t_date in zip(['Q', 'S', 'U'], t_dates):
+            ws[f'{col}{label_row}'] = "TTM"
+            ws[f'{col}{date_row}'] = t_date.strftime('%m/%d/%Y')
+
+    def _add_metric_values(self, ws, row, metric, period_type, value_cols, pct_cols):
+        """Add a derived metric (ratio, margin, total or per-share value) to the columns of one period type"""
+        if metric in DERIVED_FORMULAS:
+            section, _, style = DERIVED_FORMULAS[metric]
+        else:
+            # Statements are period-aligned, so any section's dates head analytics rows
+            section, style = 'balance_sheet', ANALYTICS_STYLES[metric]
+        statement = self._section_frames(period_type)[section]
+        masked = self.period_metrics.get(period_type)
+        if statement is None or masked is None:
             return
 
         try:
-            values = dataframe.loc[field_name].values[:3]
+            # Statements are period-aligned, so metric rows match the date headers by position
+            periods = min(len(value_cols), len(statement.columns))
+            values, states = masked
+            if metric in values.columns:
+                values = values[metric].values[:periods]
+                states = states[metric].values[:periods]
+            else:
+                values, states = [np.nan] * periods, [MISSING] * periods
+
+            for i, (col, value, state) in enumerate(zip(value_cols, values, states)):
+                self._write_metric(ws, f'{col}{row}', value, state, style)
+
+                # Add percentage changes
+                if style in ('currency', 'per_share') and i > 0:
+                    self._add_pct_change(ws, f'{pct_cols[i-1]}{row}', values[i-1], value,
+                                         f'{value_cols[i-1]}{row}', f'{col}{row}')
 
-            # Add values
-            ws[f'{col1}{row}'] = self._format_currency(values[0])
-            ws[f'{col3}{row}'] = self._format_currency(values[1])
-            ws[f'{col5}{row}'] = self._format_currency(values[2])
+        except Exception as e:
+            logger.warning(f"Error adding {period_type} {metric}: {e}")
+
+    def _write_metric(self, ws, coordinate, value, state, style):
+        """Write a derived value, or the label of its state when it has no number"""
+        if state in STATE_LABELS:
+            self._write_state(ws, coordinate, state)
+        elif style == 'currency':
+            self._write_currency(ws, coordinate, value)
+        else:
+            ws[coordinate] = round(float(value), 2) if style == 'ratio' else float(value)
+            ws[coordinate].style = style
 
-            # Calculate and add percentage changes
-            if len(values) >= 2:
-                pct_change1 = self._calculate_pct_change(values[0], values[1])
-                ws[f'{col2}{row}'] = pct_change1
-                ws[f'{col2}{row}'].number_format = '0.00%' if abs(pct_change1) < 10 else '0.0'
+    def _write_state(self, ws, coordinate, state):
+        """Write "n/a" (missing) or "n/m" (undefined) in place of a value"""
+        ws[coordinate] = STATE_LABELS[state]
+        ws[coordinate].style = 'state'
 
-            if len(values) >= 3:
-                pct_change2 = self._calculate_pct_change(values[1], values[2])
-                ws[f'{col4}{row}'] = pct_change2
-                ws[f'{col4}{row}'].number_format = '0.00%' if abs(pct_change2) < 10 else '0.0'
+    def _add_analytics_items(self, ws, start_row, section):
+        """Add an optional analytics section (per-share, cash, ...) for every period"""
+        row = start_row
+        title, metrics = ANALYTICS_SECTIONS[section]
+
+        ws[f'A{row}'] = title
+        ws[f'A{row}'].style = 'header'
+        label_row, date_row = row + 1, row + 2
+
+        # Amounts are in thousands like the statements; ratios and days are not scaled
+        if any(style == 'currency' for _, style in metrics):
+            ws[f'B{label_row}'] = "In Thousands"
+            ws[f'C{label_row}'] = self.unit_divisor
+
+        # Same period headers as the statements above
+        self._add_period_labels(ws, label_row)
+        for period_type, columns in (('quarterly', ['E', 'G', 'I']), ('annual', ['K', 'M', 'O'])):
+            frame = self.statement_frames(period_type)['balance_sheet']
+            if frame is not None:
+                for col, date in zip(columns, frame.columns[:3]):
+                    ws[f'{col}{date_row}'] = date.strftime('%m/%d/%Y')
+        self._add_ttm_headers(ws, label_row, date_row)
+
+        row = date_row + 1
+        for col in ['F', 'H', 'J', 'L', 'N', 'R', 'T']:
+            ws[f'{col}{row}'] = "Δ%"
+        row += 1
 
-        except Exception as e:
-            logger.warning(f"Error adding annual data for {field_name}: {e}")
+        # Computed from the fetched statements, so no further data calls are needed
+        for metric, _ in metrics:
+            ws[f'C{row}'] = metric
+            for period_type, (value_cols, pct_cols) in zip(PERIOD_TYPES, FORMULA_COLUMN_SETS):
+                self._add_metric_values(ws, row, metric, period_type, value_cols, pct_cols)
+            row += 1
 
-    def _calculate_working_capital(self, ws, row):
-        """Calculate Working Capital = Current Assets - Current Liabilities"""
-        # This would need to reference the cells with current assets and liabilities
-        # For now, we'll use the data directly
-        if self.quarterly_balance_sheet is not None:
-            try:
-                current_assets = self.quarterly_balance_sheet.loc['Current Assets'].values[:3]
-                current_liabilities = self.quarterly_balance_sheet.loc['Current Liabilities'].values[:3]
-
-                for i, (ca, cl) in enumerate(zip(current_assets, current_liabilities)):
-                    working_capital = ca - cl
-                    col = ['E', 'G', 'I'][i]
-                    ws[f'{col}{row}'] = self._format_currency(working_capital)
-
-                    # Add percentage changes
-                    if i > 0:
-                        prev_wc = current_assets[i-1] - current_liabilities[i-1]
-                        pct_change = self._calculate_pct_change(working_capital, prev_wc)
-                        pct_col = ['F', 'H'][i-1]
-                        ws[f'{pct_col}{row}'] = pct_change
-                        ws[f'{pct_col}{row}'].number_format = '0.00%' if abs(pct_change) < 10 else '0.0'
-
-            except Exception as e:
-                logger.warning(f"Error calculating working capital: {e}")
-
-        # Similar calculation for annual data
-        if self.annual_balance_sheet is not None:
-            try:
-                current_assets = self.annual_balance_sheet.loc['Current Assets'].values[:3]
-                current_liabilities = self.annual_balance_sheet.loc['Current Liabilities'].values[:3]
-
-                for i, (ca, cl) in enumerate(zip(current_assets, current_liabilities)):
-                    working_capital = ca - cl
-                    col = ['K', 'M', 'O'][i]
-                    ws[f'{col}{row}'] = self._format_currency(working_capital)
-
-                    # Add percentage changes
-                    if i > 0:
-                        prev_wc = current_assets[i-1] - current_liabilities[i-1]
-                        pct_change = self._calculate_pct_change(working_capital, prev_wc)
-                        pct_col = ['L', 'N'][i-1]
-                        ws[f'{pct_col}{row}'] = pct_change
-                        ws[f'{pct_col}{row}'].number_format = '0.00%' if abs(pct_change) < 10 else '0.0'
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual working capital: {e}")
-    def _calculate_networth(self, ws, row):
-        """Calculate networth = Total Assets - Total Liabilities"""
-        # This would need to reference the cells with current assets and liabilities
-        # For now, we'll use the data directly
-        if self.quarterly_balance_sheet is not None:
-            try:
-                total_assets = self.quarterly_balance_sheet.loc['Total Assets'].values[:3]
-                total_liabilities = self.quarterly_balance_sheet.loc['Total Liabilities Net Minority Interest'].values[:3]
-
-                for i, (ta, tl) in enumerate(zip(total_assets, total_liabilities)):
-                    networth = ta - tl
-                    col = ['E', 'G', 'I'][i]
-                    ws[f'{col}{row}'] = self._format_currency(networth)
-
-                    # Add percentage changes
-                    if i > 0:
-                        prev_nw = total_assets[i-1] - total_liabilities[i-1]
-                        pct_change = self._calculate_pct_change(networth, prev_nw)
-                        pct_col = ['F', 'H'][i-1]
-                        ws[f'{pct_col}{row}'] = pct_change
-                        ws[f'{pct_col}{row}'].number_format = '0.00%' if abs(pct_change) < 10 else '0.0'
-
-            except Exception as e:
-                logger.warning(f"Error calculating Networth: {e}")
-
-        # Similar calculation for annual data
-        if self.annual_balance_sheet is not None:
-            try:
-                total_assets = self.annual_balance_sheet.loc['Total Assets'].values[:3]
-                total_liabilities = self.annual_balance_sheet.loc['Total Liabilities Net Minority Interest'].values[:3]
+        return row
 
-                for i, (ta, tl) in enumerate(zip(total_assets, total_liabilities)):
-                    networth = ta - tl
-                    col = ['K', 'M', 'O'][i]
-                    ws[f'{col}{row}'] = self._format_currency(networth)
+    def _add_peer_comparison_items(self, ws, start_row):
+        """Add peer group percentile and z-score tables to the worksheet"""
+        row = start_row
 
-                    # Add percentage changes
-                    if i > 0:
-                        prev_nw = total_assets[i-1] - total_liabilities[i-1]
-                        pct_change = self._calculate_pct_change(networth, prev_nw)
-                        pct_col = ['L', 'N'][i-1]
-                        ws[f'{pct_col}{row}'] = pct_change
-                        ws[f'{pct_col}{row}'].number_format = '0.00%' if abs(pct_change) < 10 else '0.0'
+        ws[f'A{row}'] = "Peer Comparison:"
+        ws[f'A{row}'].style = 'header'
+        row += 2
 
-            except Exception as e:
-                logger.warning(f"Error calculating annual networth: {e}")
+        groups = self.peer_stats.index.get_level_values('group')
+        tickers = self.peer_stats.index.get_level_values('ticker')
 
+        for group in groups[tickers == self.ticker].unique():
+            group_stats = self.peer_stats.xs(group, level='group')
 
-    def _calculate_current_ratio(self, ws, row):
-        """Calculate Current Ratio = Current Assets / Current Liabilities"""
-        if self.quarterly_balance_sheet is not None:
-            try:
-                current_assets = self.quarterly_balance_sheet.loc['Current Assets'].values[:3]
-                current_liabilities = self.quarterly_balance_sheet.loc['Current Liabilities'].values[:3]
+            ws[f'B{row}'] = f"Peer Group: {group}"
+            ws[f'B{row}'].style = 'label'
+            ws[f'E{row}'] = "Value"
+            ws[f'F{row}'] = "Percentile"
+            ws[f'G{row}'] = "Z-Score"
+            row += 1
 
-                for i, (ca, cl) in enumerate(zip(current_assets, current_liabilities)):
-                    if cl != 0:
-                        ratio = ca / cl
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = round(ratio, 2)
+            for metric in group_stats['Value'].columns:
+                ws[f'C{row}'] = metric
+                ws[f'C{row}'].style = 'label'
+                row += 1
 
-            except Exception as e:
-                logger.warning(f"Error calculating current ratio: {e}")
+                value_style = 'margin' if metric in PERCENT_METRICS else 'ratio'
+                for ticker in group_stats.index:
+                    ws[f'C{row}'] = ticker
+                    if ticker == self.ticker:
+                        ws[f'C{row}'].style = 'label'
 
-        # Annual data
-        if self.annual_balance_sheet is not None:
-            try:
-                current_assets = self.annual_balance_sheet.loc['Current Assets'].values[:3]
-                current_liabilities = self.annual_balance_sheet.loc['Current Liabilities'].values[:3]
+                    for col, stat, style in (('E', 'Value', value_style),
+                                             ('F', 'Percentile', 'percentile'),
+                                             ('G', 'Z-Score', 'ratio')):
+                        value = group_stats.at[ticker, (stat, metric)]
+                        if not pd.isna(value):
+                            ws[f'{col}{row}'] = float(value)
+                            ws[f'{col}{row}'].style = style
 
-                for i, (ca, cl) in enumerate(zip(current_assets, current_liabilities)):
-                    if cl != 0:
-                        ratio = ca / cl
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = round(ratio, 2)
+                    row += 1
 
-            except Exception as e:
-                logger.warning(f"Error calculating annual current ratio: {e}")
+            row += 1
 
-    def _calculate_quick_ratio(self, ws, row):
-        """Calculate Quick Ratio = (Current Assets - Inventory) / Current Liabilities"""
-        if self.quarterly_balance_sheet is not None:
-            try:
-                current_assets = self.quarterly_balance_sheet.loc['Current Assets'].values[:3]
-                inventory = self.quarterly_balance_sheet.loc['Inventory'].values[:3] if 'Inventory' in self.quarterly_balance_sheet.index else [0, 0, 0]
-                current_liabilities = self.quarterly_balance_sheet.loc['Current Liabilities'].values[:3]
+        return row
 
-                for i, (ca, inv, cl) in enumerate(zip(current_assets, inventory, current_liabilities)):
-                    if cl != 0:
-                        ratio = (ca - inv) / cl
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = round(ratio, 2)
+    def _add_quarterly_data(self, ws, row, dataframe, field_name, col1, col2, col3, col4, col5, col6):
+        """Add quarterly data with percentage changes"""
+        if dataframe is None:
+            return
+        if field_name not in dataframe.index:
+            # A field the statement does not report is missing, not zero
+            for col in (col1, col3, col5):
+                self._write_state(ws, f'{col}{row}', MISSING)
+            return
 
-            except Exception as e:
-                logger.warning(f"Error calculating quick ratio: {e}")
+        try:
+            values = dataframe.loc[field_name].values[:3]
 
-        # Annual data
-        if self.annual_balance_sheet is not None:
-            try:
-                current_assets = self.annual_balance_sheet.loc['Current Assets'].values[:3]
-                inventory = self.annual_balance_sheet.loc['Inventory'].values[:3] if 'Inventory' in self.annual_balance_sheet.index else [0, 0, 0]
-                current_liabilities = self.annual_balance_sheet.loc['Current Liabilities'].values[:3]
-
-                for i, (ca, inv, cl) in enumerate(zip(current_assets, inventory, current_liabilities)):
-                    if cl != 0:
-                        ratio = (ca - inv) / cl
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = round(ratio, 2)
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual quick ratio: {e}")
-
-    def _calculate_Debt_to_Equity(self, ws, row):
-        """Calculate debt to equity = Total Liabilities - NetWorth (OE)"""
-        if self.quarterly_balance_sheet is not None:
-            try:
-                total_assets = self.quarterly_balance_sheet.loc['Total Assets'].values[:3]
-                total_liabilities = self.quarterly_balance_sheet.loc['Total Liabilities Net Minority Interest'].values[:3]
-                
-
-                for i, (ta, tl) in enumerate(zip(total_assets, total_liabilities)):
-                    networth = ta - tl
-                    if networth != 0:
-                        debt_to_equity = tl / networth
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = round(debt_to_equity, 2)
-                    
-            except Exception as e:
-                logger.warning(f"Error calculating debt to equity: {e}")
-
-        # Annual data
-        if self.annual_balance_sheet is not None:
-            try:
-                total_assets = self.annual_balance_sheet.loc['Total Assets'].values[:3]
-                total_liabilities = self.annual_balance_sheet.loc['Total Liabilities Net Minority Interest'].values[:3] 
-
-                for i, (ta, tl) in enumerate(zip(total_assets, total_liabilities)):
-                    networth = ta - tl
-                    if networth != 0:
-                        debt_to_equity = tl / networth
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = round(debt_to_equity, 2)
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual debt to equity : {e}")
-
-    def _calculate_gross_profit_margin(self, ws, row):
-        """Calculate Gross profit Margin = Gross Profit / Revenue"""
-        if self.quarterly_income is not None:
-            try:
-                revenue = self.quarterly_income.loc['Total Revenue'].values[:3]
-                gross_profit = self.quarterly_income.loc['Gross Profit'].values[:3]
+            # Add values
+            self._write_currency(ws, f'{col1}{row}', values[0])
+            self._write_currency(ws, f'{col3}{row}', values[1])
+            self._write_currency(ws, f'{col5}{row}', values[2])
 
-                for i, (rev, gp) in enumerate(zip(revenue, gross_profit)):
-                    if rev != 0:
-                        margin = gp / rev
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
+            # Calculate and add percentage changes
+            if len(values) >= 2:
+                self._add_pct_change(ws, f'{col2}{row}', values[0], values[1], f'{col1}{row}', f'{col3}{row}')
 
-            except Exception as e:
-                logger.warning(f"Error calculating gross profit  margin: {e}")
+            if len(values) >= 3:
+                self._add_pct_change(ws, f'{col4}{row}', values[1], values[2], f'{col3}{row}', f'{col5}{row}')
 
-        # Annual data
-        if self.annual_income is not None:
-            try:
-                revenue = self.annual_income.loc['Total Revenue'].values[:3]
-                gross_profit = self.annual_income.loc['Gross Profit'].values[:3]
-
-                for i, (rev, gp) in enumerate(zip(revenue, gross_profit)):
-                    if rev != 0:
-                        margin = gp / rev
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual gross profit margin: {e}")
-
-    def _calculate_ebit_margin(self, ws, row):
-        """Calculate EBIT Margin = EBIT / Revenue"""
-        if self.quarterly_income is not None:
-            try:
-                revenue = self.quarterly_income.loc['Total Revenue'].values[:3]
-                ebit = self.quarterly_income.loc['EBIT'].values[:3]
+        except Exception as e:
+            logger.warning(f"Error adding quarterly data for {field_name}: {e}")
 
-                for i, (rev, ebit_value) in enumerate(zip(revenue, ebit)):
-                    if rev != 0:
-                        margin = ebit_value / rev
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
+    def _add_annual_data(self, ws, row, dataframe, field_name, col1, col2, col3, col4, col5):
+        """Add annual data with percentage changes"""
+        if dataframe is None:
+            return
+        if field_name not in dataframe.index:
+            for col in (col1, col3, col5):
+                self._write_state(ws, f'{col}{row}', MISSING)
+            return
 
-            except Exception as e:
-                logger.warning(f"Error calculating EBIT margin: {e}")
+        try:
+            values = dataframe.loc[field_name].values[:3]
 
-        # Annual data
-        if self.annual_income is not None:
-            try:
-                revenue = self.annual_income.loc['Total Revenue'].values[:3]
-                ebit = self.annual_income.loc['EBIT'].values[:3]
-
-                for i, (rev, ebit_value) in enumerate(zip(revenue, ebit)):
-                    if rev != 0:
-                        margin = ebit_value / rev
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual EBIT margin: {e}")
-
-    def _calculate_net_income_margin(self, ws, row):
-        """Calculate Net Income Margin = Net Income / Revenue"""
-        if self.quarterly_income is not None:
-            try:
-                revenue = self.quarterly_income.loc['Total Revenue'].values[:3]
-                net_income = self.quarterly_income.loc['Net Income'].values[:3]
+            # Add values
+            self._write_currency(ws, f'{col1}{row}', values[0])
+            self._write_currency(ws, f'{col3}{row}', values[1])
+            self._write_currency(ws, f'{col5}{row}', values[2])
 
-                for i, (rev, ni) in enumerate(zip(revenue, net_income)):
-                    if rev != 0:
-                        margin = ni / rev
-                        col = ['E', 'G', 'I'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
+            # Calculate and add percentage changes
+            if len(values) >= 2:
+                self._add_pct_change(ws, f'{col2}{row}', values[0], values[1], f'{col1}{row}', f'{col3}{row}')
 
-            except Exception as e:
-                logger.warning(f"Error calculating net income margin: {e}")
+            if len(values) >= 3:
+                self._add_pct_change(ws, f'{col4}{row}', values[1], values[2], f'{col3}{row}', f'{col5}{row}')
 
-        # Annual data
-        if self.annual_income is not None:
-            try:
-                revenue = self.annual_income.loc['Total Revenue'].values[:3]
-                net_income = self.annual_income.loc['Net Income'].values[:3]
-
-                for i, (rev, ni) in enumerate(zip(revenue, net_income)):
-                    if rev != 0:
-                        margin = ni / rev
-                        col = ['K', 'M', 'O'][i]
-                        ws[f'{col}{row}'] = margin
-                        ws[f'{col}{row}'].number_format = '0.0%'
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual net income margin: {e}")
-
-    def _calculate_net_cash_flow(self, ws, row):
-        """Calculate Net Cash Flow = Operating + Investing + Financing Cash Flow"""
-        if self.quarterly_cashflow is not None:
-            try:
-                operating = self.quarterly_cashflow.loc['Operating Cash Flow'].values[:3] if 'Operating Cash Flow' in self.quarterly_cashflow.index else [0, 0, 0]
-                investing = self.quarterly_cashflow.loc['Investing Cash Flow'].values[:3] if 'Investing Cash Flow' in self.quarterly_cashflow.index else [0, 0, 0]
-                financing = self.quarterly_cashflow.loc['Financing Cash Flow'].values[:3] if 'Financing Cash Flow' in self.quarterly_cashflow.index else [0, 0, 0]
+        except Exception as e:
+            logger.warning(f"Error adding annual data for {field_name}: {e}")
 
-                for i, (op, inv, fin) in enumerate(zip(operating, investing, financing)):
-                    net_cash = op + inv + fin
-                    col = ['E', 'G', 'I'][i]
-                    ws[f'{col}{row}'] = self._format_currency(net_cash)
+    def _write_currency(self, ws, coordinate, value):
+        """Write a statement value as a number in report units with the currency style"""
+        if pd.isna(value):
+            # Missing is shown as "n/a"; a reported zero keeps the accounting dash
+            self._write_state(ws, coordinate, MISSING)
+            return
 
-            except Exception as e:
-                logger.warning(f"Error calculating net cash flow: {e}")
+        ws[coordinate] = self._to_report_units(value)
+        ws[coordinate].style = 'currency'
 
-        # Annual data
-        if self.annual_cashflow is not None:
-            try:
-                operating = self.annual_cashflow.loc['Operating Cash Flow'].values[:3] if 'Operating Cash Flow' in self.annual_cashflow.index else [0, 0, 0]
-                investing = self.annual_cashflow.loc['Investing Cash Flow'].values[:3] if 'Investing Cash Flow' in self.annual_cashflow.index else [0, 0, 0]
-                financing = self.annual_cashflow.loc['Financing Cash Flow'].values[:3] if 'Financing Cash Flow' in self.annual_cashflow.index else [0, 0, 0]
-
-                for i, (op, inv, fin) in enumerate(zip(operating, investing, financing)):
-                    net_cash = op + inv + fin
-                    col = ['K', 'M', 'O'][i]
-                    ws[f'{col}{row}'] = self._format_currency(net_cash)
-
-            except Exception as e:
-                logger.warning(f"Error calculating annual net cash flow: {e}")
-
-    def _format_currency(self, value):
-        """Format value as currency string"""
-        if pd.isna(value) or value == 0:
-            return "$0"
-
-        # Values are already in thousands
-        if value < 0:
-            return f"$({abs(value):,.0f})"
-        else:
-            return f"${value:,.0f}"
+    def _to_report_units(self, value):
+        """Scale a raw statement value by the "In Thousands" divisor"""
+        return float(value) / self.unit_divisor
 
     def _calculate_pct_change(self, current, previous):
-        """Calculate percentage change"""
+        """Calculate percentage change (NaN when the previous value is zero)"""
         if previous == 0:
-            return 0
+            return np.nan
         return (current - previous) / abs(previous)
 
-    def generate_report(self):
-        """Main method to generate the complete report"""
+    def generate_report(self, fetch=True):
+        """Main method to generate the complete report
+
+        With ``fetch=False`` the statements already fetched (or restored) are reported.
+        """
         logger.info(f"Starting report generation for {self.ticker}...")
 
         # Fetch all data
-        if not self.fetch_all_data():
+        if fetch and not self.fetch_all_data():
             logger.error("Failed to fetch financial data")
             return False
 
+        # Validate statements before anything is rendered
+        if not self.passes_quality_gate():
+            logger.error(f"Data quality for {self.ticker} below {self.min_quality}, report not generated")
+            return False
+
         # Create Excel report
         self.create_excel_report()
 
@@ -868,9 +1055,31 @@ class TeslaFinancialReportGenerator:
 class FinancialReportAutomation:
     """Automation wrapper for scheduling and running reports"""
 
-    def __init__(self, ticker="TSLA", output_dir="./reports"):
+    def __init__(self, ticker="TSLA", output_dir="./reports", peer_groups=None, use_formulas=False,
+                 template_path=None, min_quality=None, fx_rates=None, sections=(), covenants=None):
         self.ticker = ticker
         self.output_dir = output_dir
+        self.peer_groups = peer_groups
+        self.use_formulas = use_formulas
+        self.template_path = template_path
+        self.min_quality = min_quality
+        self.fx_rates = fx_rates
+        self.sections = sections
+
+        # Covenant monitor evaluated after every run (optional)
+        self.covenants = covenants
+
+        # Latest quarter end per ticker fetched (None without quarterly statements), for filing-driven scheduling
+        self.latest_quarters = {}
+
+        # FX rate tables of queued jobs, loaded once per file
+        self._fx_tables = {}
+
+        # Every fetch of this automation goes through one provider circuit breaker
+        self.breaker = CircuitBreaker()
+
+        # In-memory statements reused across runs of a resident worker (optional)
+        self.statement_cache = None
 
         # Create output directory if it doesn't exist
         os.makedirs(output_dir, exist_ok=True)
@@ -880,31 +1089,355 @@ class FinancialReportAutomation:
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         output_file = os.path.join(self.output_dir, f"{self.ticker}_financial_report_{timestamp}.xlsx")
 
-        generator = TeslaFinancialReportGenerator(self.ticker, output_file)
-        success = generator.generate_report()
+        generator = TeslaFinancialReportGenerator(self.ticker, output_file,
+                                                  use_formulas=self.use_formulas,
+                                                  template_path=self.template_path,
+                                                  min_quality=self.min_quality,
+                                                  fx_rates=self.fx_rates,
+                                                  sections=self.sections,
+                                                  breaker=self.breaker)
+        with tracing.span("report", ticker=self.ticker):
+            if self.peer_groups:
+                # The ticker's own statements are fetched once and ranked with the rest of the universe
+                success = generator.fetch_all_data()
+                if success:
+                    generator.peer_stats = self.compute_peer_statistics([generator])
+                    success = generator.generate_report(fetch=False)
+            else:
+                success = generator.generate_report()
 
         if success:
             logger.info(f"Report saved to: {output_file}")
+            if self.covenants is not None:
+                self.monitor_covenants([generator], timestamp)
             return output_file
         else:
             logger.error("Report generation failed")
             return None
 
-    def schedule_daily_report(self, time_str="09:00"):
-        """Schedule daily report generation"""
+    def run_batch(self, tickers, workers=None, fetch_threads=8, journal=None):
+        """Run reports for many tickers, rendering workbooks in worker processes
+
+        With a ``BatchJournal`` finished tickers are skipped and statements
+        fetched by an earlier (crashed) run of the batch are reused.
+        """
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        if journal is not None:
+            timestamp = journal.timestamp
+            tickers = journal.pending(tickers)
+
+        generators = [
+            TeslaFinancialReportGenerator(
+                ticker,
+                os.path.join(self.output_dir, f"{ticker}_financial_report_{timestamp}.xlsx"),
+                use_formulas=self.use_formulas,
+                min_quality=self.min_quality,
+                fx_rates=self.fx_rates,
+                sections=self.sections,
+                breaker=self.breaker,
+            )
+            for ticker in tickers
+        ]
+
+        planned = []
+
+        # Journal checkpoints and a resident worker's cache both hold already-fetched statements
+        checkpoints = journal if journal is not None else self.statement_cache
+
+        def fetch(generator):
+            # Runs on a fetch thread, so the batch span is passed explicitly
+            with tracing.span("load", parent=batch, ticker=generator.ticker) as load:
+                if checkpoints is None:
+                    return generator.fetch_all_data()
+
+                state = checkpoints.load_statements(generator.ticker)
+                if state is not None:
+                    if load is not None:
+                        load.set(checkpoint=True)
+                    generator.restore_state(state)
+                    return True
+
+                fetched = generator.fetch_all_data()
+                if fetched:
+                    checkpoints.save_statements(generator.ticker, generator.fetched_state())
+                return fetched
+
+        def planned_jobs(pool):
+            # Fetches are network bound and run on threads; each row plan is
+            # handed to the render pool as soon as its data arrives
+            results = pool.map(fetch, generators)
+
+            if self.peer_groups:
+                # Peer ranks need every fetch of the batch before the first plan is laid out
+                results = list(results)
+                peer_stats = self.compute_peer_statistics(
+                    [generator for generator, fetched in zip(generators, results) if fetched], fetch)
+                for generator in generators:
+                    generator.peer_stats = peer_stats
+
+            for generator, fetched in zip(generators, results):
+                if not fetched:
+                    logger.error(f"Report generation failed for {generator.ticker}")
+                    continue
+
+                quarters = generator.quarterly_balance_sheet
+                self.latest_quarters[generator.ticker] = \
+                    quarters.columns[0] if quarters is not None and not quarters.empty else None
+
+                if not generator.passes_quality_gate():
+                    logger.error(f"Data quality for {generator.ticker} below {self.min_quality}, report skipped")
+                    if journal is not None:
+                        journal.record(generator.ticker, SKIPPED)
+                else:
+                    planned.append(generator)
+                    yield generator.output_file, generator.build_row_plan()
+
+        # Each report is journaled as soon as it is saved
+        on_rendered = None
+        if journal is not None:
+            tickers_by_output = {generator.output_file: generator.ticker for generator in generators}
+            on_rendered = lambda output_file: journal.record(tickers_by_output[output_file], DONE, output_file)
+
+        logger.info(f"Starting batch of {len(generators)} reports...")
+        with tracing.span("batch", tickers=len(generators)) as batch, \
+                ThreadPoolExecutor(max_workers=fetch_threads) as pool:
+            output_files = render_plans(planned_jobs(pool), workers, self.template_path, on_rendered)
+
+        # Per-ticker quality scores of the whole batch
+        scored = [generator.data_quality for generator in generators if generator.data_quality is not None]
+        if scored:
+            quality_file = os.path.join(self.output_dir, f"data_quality_{timestamp}.csv")
+            # A resumed batch adds its scores to those of the earlier run
+            resumed = journal is not None and os.path.exists(quality_file)
+            pd.concat(scored).to_csv(quality_file, mode='a' if resumed else 'w', header=not resumed)
+            logger.info(f"Data quality scores saved to {quality_file}")
+
+        if self.covenants is not None:
+            self.monitor_covenants(planned, timestamp)
+
+        if self.breaker.state != CLOSED:
+            logger.warning(f"Data provider circuit {self.breaker.state}: {self.breaker.rejected} fetches rejected "
+                           f"so far, rerun the failed tickers once it closes")
+        logger.info(f"Batch complete: {len(output_files)}/{len(generators)} reports saved to {self.output_dir}")
+        return output_files
+
+    @classmethod
+    def from_layout(cls, output_dir, layout):
+        """Automation configured from a job layout (see ``job_layout``)"""
+        fx_rates = FxRateTable(layout['fx_rates'], layout.get('currency', "USD")) if layout.get('fx_rates') else None
+        covenants = CovenantMonitor(layout['covenants'], output_dir) if layout.get('covenants') else None
+        return cls(output_dir=output_dir, peer_groups=layout.get('peer_groups'),
+                   use_formulas=layout.get('use_formulas', False),
+                   template_path=layout.get('template_path'), min_quality=layout.get('min_quality'),
+                   fx_rates=fx_rates, sections=layout.get('sections', ()), covenants=covenants)
+
+    def job_layout(self):
+        """Report options shipped with every queued or submitted job, so any worker renders the same layout"""
+        return {
+            'use_formulas': self.use_formulas,
+            'template_path': self.template_path,
+            'min_quality': self.min_quality,
+            'sections': list(self.sections),
+            'fx_rates': self.fx_rates.path if self.fx_rates is not None else None,
+            'currency': self.fx_rates.reporting_currency if self.fx_rates is not None else "USD",
+            'peer_groups': self.peer_groups,
+            'covenants': os.path.abspath(self.covenants.config_path) if self.covenants is not None else None,
+        }
+
+    def enqueue_batch(self, queue, tickers):
+        """Enqueue one report job per ticker for the workers of a shared queue"""
+        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+        layout = self.job_layout()
+
+        return queue.enqueue([
+            (ticker, layout, os.path.join(self.output_dir, f"{ticker}_financial_report_{timestamp}.xlsx"))
+            for ticker in tickers
+        ])
+
+    def run_worker(self, queue, workers=None, fetch_threads=8, batch_size=16, poll_seconds=10, drain=False):
+        """Lease, fetch, render and ack queued report jobs until stopped (or the queue is drained)"""
+        worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        logger.info(f"Worker {worker_id} polling {queue.path}...")
+
+        while True:
+            # Jobs are left to other nodes while this node's provider circuit is open
+            if self.breaker.is_open():
+                time.sleep(poll_seconds)
+                continue
+
+            jobs = queue.lease(worker_id, batch_size)
+            if jobs:
+                self.run_jobs(queue, jobs, workers, fetch_threads)
+                continue
+
+            counts = queue.counts()
+            if drain and counts[READY] + counts[LEASED] == 0:
+                logger.info(f"Queue drained: {counts}")
+                return counts
+            time.sleep(poll_seconds)
+
+    def run_jobs(self, queue, jobs, workers=None, fetch_threads=8):
+        """Run one leased batch of jobs, acking rendered reports and failing the rest"""
+        generators = [(job, self._job_generator(job)) for job in jobs]
+        planned = []
+
+        def fetch(generator):
+            with tracing.span("load", parent=batch, ticker=generator.ticker):
+                return generator.fetch_all_data()
+
+        def planned_jobs(pool, group):
+            for (job, generator), fetched in zip(group, pool.map(lambda item: fetch(item[1]), group)):
+                if not fetched and generator.fetch_rejected:
+                    # The provider was never called, so the job is retried after the cooldown at no attempt
+                    queue.release(job, self.breaker.retry_after())
+                elif not fetched:
+                    queue.fail(job, "fetch failed")
+                elif not generator.passes_quality_gate():
+                    # Retrying does not change the statements' quality
+                    queue.fail(job, f"data quality below {generator.min_quality}", retry=False)
+                else:
+                    planned.append(job)
+                    yield generator.output_file, generator.build_row_plan()
+
+        # Jobs are rendered in groups sharing a template; their leases are extended until they are acked
+        templates = {job['layout'].get('template_path') for job in jobs}
+        rendered = set()
+        with queue.heartbeat(jobs, jobs[0]['lease_owner']), \
+                tracing.span("worker batch", jobs=len(jobs)) as batch, \
+                ThreadPoolExecutor(max_workers=fetch_threads) as pool:
+            for template_path in templates:
+                group = [item for item in generators if item[0]['layout'].get('template_path') == template_path]
+                rendered.update(render_plans(planned_jobs(pool, group), workers, template_path))
+
+            for job in planned:
+                if job['output'] in rendered:
+                    queue.ack(job)
+                else:
+                    queue.fail(job, "render failed")
+
+        logger.info(f"Worker batch complete: {len(rendered)}/{len(jobs)} reports rendered")
+        return sorted(rendered)
+
+    def _job_generator(self, job):
+        """Report generator configured from a queued job's layout"""
+        layout = job['layout']
+
+        fx_rates = None
+        if layout.get('fx_rates'):
+            key = (layout['fx_rates'], layout.get('currency', "USD"))
+            if key not in self._fx_tables:
+                self._fx_tables[key] = FxRateTable(*key)
+            fx_rates = self._fx_tables[key]
+
+        return TeslaFinancialReportGenerator(job['ticker'], job['output'],
+                                             use_formulas=layout.get('use_formulas', False),
+                                             template_path=layout.get('template_path'),
+                                             min_quality=layout.get('min_quality'),
+                                             fx_rates=fx_rates,
+                                             sections=layout.get('sections', ()),
+                                             breaker=self.breaker)
+
+    def monitor_covenants(self, generators, timestamp):
+        """Re-evaluate covenants of the tickers whose statements changed and write the breach report"""
+        statements = {
+            generator.ticker: {f"{period_type} {section}": frame
+                               for period_type in ('quarterly', 'annual')
+                               for section, frame in generator.statement_frames(period_type).items()}
+            for generator in generators
+        }
+        changed = self.covenants.changed(statements)
+
+        # Metrics were computed while laying out the reports
+        metrics = {generator.ticker: generator.period_metrics for generator in generators
+                   if generator.ticker in changed}
+        breaches = self.covenants.update(metrics, changed)
+        return self.covenants.write_breach_report(breaches, timestamp)
+
+    def compute_peer_statistics(self, fetched=(), fetch=None):
+        """Rank every ticker of the peer universe within its groups
+
+        ``fetched`` are generators whose statements the run already holds; only the
+        rest of the universe is loaded, with ``fetch(generator)`` when given (e.g.
+        to reuse a batch's checkpoints) or from the provider.
+        """
+        universe = sorted({ticker for tickers in self.peer_groups.values() for ticker in tickers})
+        logger.info(f"Computing peer statistics for {len(universe)} tickers...")
+
+        if fetch is None:
+            fetch = TeslaFinancialReportGenerator.fetch_all_data
+
+        generators = {generator.ticker: generator for generator in fetched}
+        for ticker in universe:
+            if ticker in generators:
+                continue
+
+            generator = TeslaFinancialReportGenerator(ticker, fx_rates=self.fx_rates, breaker=self.breaker)
+            if fetch(generator):
+                generators[ticker] = generator
+
+        statements = {
+            ticker: {
+                'balance_sheet': generator.quarterly_balance_sheet,
+                'income': generator.quarterly_income,
+                'cashflow': generator.quarterly_cashflow,
+            }
+            for ticker, generator in generators.items() if ticker in universe
+        }
+
+        if not statements:
+            logger.warning("No peer data fetched, skipping peer comparison")
+            return None
+
+        # Ratios and group statistics are computed once for the whole universe
+        panel = compute_metric_panel(statements)
+        return peer_statistics(panel, self.peer_groups)
+
+    def run_due(self, tickers, scheduler):
+        """Run a batch of the tickers the filing scheduler says are due"""
+        due = scheduler.due(tickers)
+        if not due:
+            return []
+
+        # Only tickers fetched by this run are stamped; failed fetches stay due on the next check
+        for ticker in due:
+            self.latest_quarters.pop(ticker, None)
+
+        output_files = self.run_batch(due)
+        scheduler.record([ticker for ticker in due if ticker in self.latest_quarters], self.latest_quarters)
+        return output_files
+
+    def schedule_filing_driven(self, tickers, scheduler, check_minutes=60):
+        """Poll tickers intensively after their expected filings and on a rare heartbeat otherwise"""
+        logger.info(f"Scheduling filing-driven fetches of {len(tickers)} tickers every {check_minutes} minutes")
+
+        self.run_due(tickers, scheduler)
+        schedule.every(check_minutes).minutes.do(self.run_due, tickers, scheduler)
+
+        while True:
+            schedule.run_pending()
+            time.sleep(60)
+
+    def schedule_daily_report(self, time_str="09:00", tickers=None):
+        """Schedule daily report generation (a batch run when tickers are given)"""
         logger.info(f"Scheduling daily report generation at {time_str}")
 
-        schedule.every().day.at(time_str).do(self.run_report)
+        if tickers:
+            schedule.every().day.at(time_str).do(self.run_batch, tickers)
+        else:
+            schedule.every().day.at(time_str).do(self.run_report)
 
         while True:
             schedule.run_pending()
             time.sleep(60)  # Check every minute
 
-    def schedule_weekly_report(self, day="monday", time_str="09:00"):
-        """Schedule weekly report generation"""
+    def schedule_weekly_report(self, day="monday", time_str="09:00", tickers=None):
+        """Schedule weekly report generation (a batch run when tickers are given)"""
         logger.info(f"Scheduling weekly report generation on {day} at {time_str}")
 
-        getattr(schedule.every(), day).at(time_str).do(self.run_report)
+        if tickers:
+            getattr(schedule.every(), day).at(time_str).do(self.run_batch, tickers)
+        else:
+            getattr(schedule.every(), day).at(time_str).do(self.run_report)
 
         while True:
             schedule.run_pending()
@@ -918,26 +1451,139 @@ def main():
     parser = argparse.ArgumentParser(description='Tesla Financial Report Generator')
     parser.add_argument('--ticker', default='TSLA', help='Stock ticker symbol')
     parser.add_argument('--output', default='./reports', help='Output directory for reports')
-    parser.add_argument('--schedule', choices=['none', 'daily', 'weekly'], default='none',
+    parser.add_argument('--schedule', choices=['none', 'daily', 'weekly', 'filings'], default='none',
                         help='Schedule type for automatic generation')
     parser.add_argument('--time', default='09:00', help='Time for scheduled reports (HH:MM)')
     parser.add_argument('--day', default='monday', help='Day for weekly reports')
+    parser.add_argument('--peers', help='Comma-separated peer tickers to rank the ticker against')
+    parser.add_argument('--peer-config', help='JSON file mapping peer group names to ticker lists')
+    parser.add_argument('--formulas', action='store_true',
+                        help='Write derived rows and Δ%% columns as live Excel formulas')
+    parser.add_argument('--template', help='Pre-styled xlsx template (in the report layout) to fill with values')
+    parser.add_argument('--min-quality', type=float, default=None,
+                        help='Skip reports whose data-quality score (0-100) is below this')
+    parser.add_argument('--fiscal-calendar', help='JSON file mapping tickers to fiscal year-end months (1-12)')
+    parser.add_argument('--fx-rates', help='CSV of currency,date,rate quotes for converting non-USD filers')
+    parser.add_argument('--currency', default='USD', help='Reporting currency when --fx-rates is given')
+    parser.add_argument('--per-share', action='store_true',
+                        help='Add a per-share section (book value, tangible book value, EPS, FCF)')
+    parser.add_argument('--sections', default='',
+                        help=f'Comma-separated analytics sections to add ({", ".join(ANALYTICS_SECTIONS)})')
+    parser.add_argument('--tickers', help='Comma-separated tickers for a batch run')
+    parser.add_argument('--workers', type=int, default=None,
+                        help='Render worker processes for batch runs (default: CPU count)')
+    parser.add_argument('--filing-calendar',
+                        help='CSV (ticker,date) or JSON file of expected filing dates for --schedule filings')
+    parser.add_argument('--journal',
+                        help='Checkpoint directory of a batch run; rerunning with it resumes the batch')
+    parser.add_argument('--queue', help='SQLite work-queue file shared by producers and worker nodes')
+    parser.add_argument('--enqueue', action='store_true', help='Enqueue a job per --tickers ticker in --queue')
+    parser.add_argument('--worker', action='store_true', help='Run queued report jobs from --queue')
+    parser.add_argument('--drain', action='store_true', help='Stop the worker once the queue is empty')
+    parser.add_argument('--trace',
+                        help='Write a span trace of the run (Chrome trace JSON for chrome://tracing or Perfetto)')
+    parser.add_argument('--profile', action='store_true',
+                        help='Profile the run (cProfile, tracemalloc, collapsed stacks) into the output directory')
+    parser.add_argument('--serve', action='store_true',
+                        help='Run a resident worker that keeps data warm and takes jobs over a local socket')
+    parser.add_argument('--submit', action='store_true',
+                        help='Send the report job to the resident worker instead of running it here')
+    parser.add_argument('--server-address', default=f'{DEFAULT_ADDRESS[0]}:{DEFAULT_ADDRESS[1]}',
+                        help='host:port of the resident worker')
+    parser.add_argument('--covenants',
+                        help='JSON file of per-ticker covenant thresholds to monitor after every run')
 
     # Parse known arguments and ignore the rest
     args, unknown = parser.parse_known_args()
 
+    # Fiscal year ends known up front are not derived from statement dates
+    if args.fiscal_calendar:
+        load_fiscal_calendar(args.fiscal_calendar)
+
+    # Peer groups for the comparison section
+    peer_groups = None
+    if args.peer_config:
+        with open(args.peer_config) as f:
+            peer_groups = json.load(f)
+    elif args.peers:
+        peers = [ticker.strip().upper() for ticker in args.peers.split(',') if ticker.strip()]
+        peer_groups = {"Peers": [args.ticker] + [ticker for ticker in peers if ticker != args.ticker]}
+
+    # Optional analytics sections
+    sections = [section.strip() for section in args.sections.split(',') if section.strip()]
+    if args.per_share:
+        sections.append('per_share')
+
+    # Rate table for converting every ticker into one reporting currency
+    fx_rates = FxRateTable(args.fx_rates, args.currency) if args.fx_rates else None
+
+    # Covenant status is kept next to the reports between runs
+    covenants = CovenantMonitor(args.covenants, args.output) if args.covenants else None
+
     # Create automation instance
-    automation = FinancialReportAutomation(args.ticker, args.output)
-
-    if args.schedule == 'none':
-        # Run once
-        automation.run_report()
-    elif args.schedule == 'daily':
-        # Schedule daily
-        automation.schedule_daily_report(args.time)
-    elif args.schedule == 'weekly':
-        # Schedule weekly
-        automation.schedule_weekly_report(args.day, args.time)
+    automation = FinancialReportAutomation(args.ticker, args.output, peer_groups, args.formulas, args.template,
+                                           args.min_quality, fx_rates, sections, covenants)
+
+    tickers = [ticker.strip().upper() for ticker in (args.tickers or '').split(',') if ticker.strip()]
+
+    # Spans of everything below are exported when the run ends (or is interrupted)
+    if args.trace:
+        tracing.enable()
+
+    def dispatch():
+        if (args.serve or args.submit) and not os.environ.get(KEY_VARIABLE):
+            # Jobs are unpickled by the server, so it only talks to clients holding the shared secret
+            logger.error(f"Set {KEY_VARIABLE} to a shared secret to run or reach the report server")
+        elif args.serve:
+            # Resident worker: imports, provider session and fetched statements stay warm between jobs
+            ReportServer(FinancialReportAutomation.from_layout, parse_address(args.server_address),
+                         workers=args.workers).serve_forever()
+        elif args.submit:
+            job = {'action': 'report', 'tickers': tickers or [args.ticker],
+                   'output_dir': os.path.abspath(args.output), 'layout': automation.job_layout()}
+            try:
+                for output_file in submit(job, parse_address(args.server_address)):
+                    logger.info(f"Report saved to: {output_file}")
+            except ConnectionError:
+                logger.warning(f"No report server at {args.server_address}, running the job here")
+                automation.run_batch(job['tickers'], args.workers)
+        elif args.queue and (args.enqueue or args.worker):
+            queue = WorkQueue(args.queue)
+            if args.enqueue:
+                # Producer: jobs are picked up by workers on any node sharing the queue file
+                automation.enqueue_batch(queue, tickers or [args.ticker])
+            if args.worker:
+                automation.run_worker(queue, args.workers, drain=args.drain)
+        elif args.schedule == 'filings':
+            # Fetch around expected filings only
+            calendar = load_filing_calendar(args.filing_calendar) if args.filing_calendar else None
+            scheduler = FilingScheduler(calendar, os.path.join(args.output, "fetch_schedule.json"))
+            automation.schedule_filing_driven(tickers or [args.ticker], scheduler)
+        elif args.schedule == 'daily':
+            # Schedule daily
+            automation.schedule_daily_report(args.time, tickers)
+        elif args.schedule == 'weekly':
+            # Schedule weekly
+            automation.schedule_weekly_report(args.day, args.time, tickers)
+        elif tickers:
+            # Batch run across worker processes, resumable when journaled
+            journal = BatchJournal(args.journal) if args.journal else None
+            automation.run_batch(tickers, args.workers, journal=journal)
+        else:
+            # Run once
+            automation.run_report()
+
+    try:
+        if args.profile:
+            # Time and allocations are attributed to the metric calculations and report stages
+            targets = ([(TeslaFinancialReportGenerator, name) for name in PROFILED_METHODS]
+                       + [(sys.modules[__name__], name) for name in PROFILED_FUNCTIONS])
+            profile_call(dispatch, args.output, targets)
+        else:
+            dispatch()
+    finally:
+        if args.trace:
+            tracing.export(args.trace)
 
 
 if __name__ == "__main__":
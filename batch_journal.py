@@ -0,0 +1,95 @@
+"""
+Checkpoint journal for long batch runs
+Records finished tickers and their fetched statements so a restarted batch skips done work and refetches nothing
+"""
+
+import pandas as pd
+import logging
+import json
+import os
+import threading
+from datetime import datetime
+
+logger = logging.getLogger(__name__)
+
+# Ticker outcomes that need no work on resume (fetch and render failures are retried)
+DONE = 'done'
+SKIPPED = 'skipped'
+
+
+class BatchJournal:
+    """Append-only journal of one batch run in a directory
+
+    ``journal.jsonl`` holds one event per finished ticker and ``statements/``
+    a pickle of each ticker's fetched statements. The batch timestamp is kept
+    in ``batch.json`` so a resumed batch names its reports like the first run.
+    """
+
+    def __init__(self, directory):
+        self.directory = directory
+        self.events_file = os.path.join(directory, "journal.jsonl")
+        self.statements_dir = os.path.join(directory, "statements")
+        os.makedirs(self.statements_dir, exist_ok=True)
+
+        batch_file = os.path.join(directory, "batch.json")
+        if os.path.exists(batch_file):
+            with open(batch_file) as f:
+                self.timestamp = json.load(f)['timestamp']
+        else:
+            self.timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
+            with open(batch_file, 'w') as f:
+                json.dump({'timestamp': self.timestamp}, f)
+
+        # Reports are recorded from the render pool's result thread as well as the batch thread
+        self._lock = threading.Lock()
+
+        # Later events of a ticker override earlier ones
+        self.completed = {}
+        if os.path.exists(self.events_file):
+            with open(self.events_file) as f:
+                for line in f:
+                    try:
+                        event = json.loads(line)
+                    except ValueError:
+                        # A crash may leave the last line half written
+                        continue
+                    self.completed[event['ticker']] = event
+
+        if self.completed:
+            logger.info(f"Resuming batch {self.timestamp}: {len(self.completed)} tickers already finished")
+
+    def pending(self, tickers):
+        """Tickers of a batch that have not finished yet"""
+        return [ticker for ticker in tickers if ticker not in self.completed]
+
+    def record(self, ticker, status, output=None):
+        """Append a finished ticker's outcome, flushed to disk before returning"""
+        event = {'ticker': ticker, 'status': status, 'output': output, 'at': datetime.now().isoformat()}
+        with self._lock:
+            with open(self.events_file, 'a') as f:
+                f.write(json.dumps(event) + "\n")
+                f.flush()
+                os.fsync(f.fileno())
+
+            self.completed[ticker] = event
+
+    def save_statements(self, ticker, state):
+        """Checkpoint a ticker's fetched statements (written atomically)"""
+        path = self._statements_path(ticker)
+        pd.to_pickle(state, path + ".tmp")
+        os.replace(path + ".tmp", path)
+
+    def load_statements(self, ticker):
+        """Fetched statements of a ticker from an earlier run, or None"""
+        path = self._statements_path(ticker)
+        if not os.path.exists(path):
+            return None
+
+        try:
+            return pd.read_pickle(path)
+        except Exception as e:
+            logger.warning(f"Unreadable checkpoint for {ticker}, fetching again: {e}")
+            return None
+
+    def _statements_path(self, ticker):
+        return os.path.join(self.statements_dir, f"{ticker}.pkl")
@@ -0,0 +1,95 @@
+"""
+Circuit breaker for the market-data provider
+Stops sending requests once the provider's error rate trips a threshold and probes it before closing again
+"""
+
+import logging
+import threading
+import time
+from collections import deque
+
+logger = logging.getLogger(__name__)
+
+# Breaker states: requests pass, are rejected, or only a few probes pass
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half-open'
+
+
+class CircuitBreaker:
+    """Thread-safe circuit breaker over a rolling window of call outcomes
+
+    The breaker opens when at least ``min_calls`` of the last ``window`` calls
+    were made and ``error_threshold`` of them failed. After ``cooldown`` seconds
+    it lets ``probes`` calls through (half-open); it closes when they all
+    succeed and opens again on the first failure.
+    """
+
+    def __init__(self, error_threshold=0.5, window=20, min_calls=10, cooldown=60, probes=3):
+        self.error_threshold = error_threshold
+        self.min_calls = min_calls
+        self.cooldown = cooldown
+        self.probes = probes
+
+        self.state = CLOSED
+        self.outcomes = deque(maxlen=window)
+        self.opened_at = None
+        self.probes_started = 0
+        self.probes_passed = 0
+        self.rejected = 0
+        self._lock = threading.Lock()
+
+    def allow(self):
+        """True when a call may go to the provider now"""
+        with self._lock:
+            if self.state == OPEN and time.monotonic() - self.opened_at >= self.cooldown:
+                self.state = HALF_OPEN
+                self.probes_started = self.probes_passed = 0
+                logger.info("Data provider circuit half-open, probing")
+
+            if self.state == CLOSED:
+                return True
+            if self.state == HALF_OPEN and self.probes_started < self.probes:
+                self.probes_started += 1
+                return True
+
+            self.rejected += 1
+            return False
+
+    def record(self, success):
+        """Record the outcome of a call that was allowed"""
+        with self._lock:
+            if self.state == HALF_OPEN:
+                if not success:
+                    self._open("probe failed")
+                else:
+                    self.probes_passed += 1
+                    if self.probes_passed >= self.probes:
+                        self.state = CLOSED
+                        self.outcomes.clear()
+                        logger.info(f"Data provider circuit closed ({self.rejected} calls were rejected while open)")
+                        self.rejected = 0
+                return
+
+            self.outcomes.append(success)
+            failures = self.outcomes.count(False)
+            if (self.state == CLOSED and len(self.outcomes) >= self.min_calls
+                    and failures / len(self.outcomes) >= self.error_threshold):
+                self._open(f"{failures}/{len(self.outcomes)} recent calls failed")
+
+    def _open(self, reason):
+        self.state = OPEN
+        self.opened_at = time.monotonic()
+        logger.warning(f"Data provider circuit open for {self.cooldown}s: {reason}")
+
+    def retry_after(self):
+        """Seconds until the cooldown passes and calls are let through again (0 unless open)"""
+        with self._lock:
+            if self.state != OPEN:
+                return 0.0
+            return max(0.0, self.cooldown - (time.monotonic() - self.opened_at))
+
+    def is_open(self):
+        """True while calls are rejected (the cooldown has not passed yet)"""
+        with self._lock:
+            return self.state == OPEN and time.monotonic() - self.opened_at < self.cooldown
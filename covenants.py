@@ -0,0 +1,219 @@
+"""
+Covenant threshold monitor for a portfolio of obligors
+Evaluates per-ticker covenant thresholds against computed metrics, re-evaluating only tickers whose inputs changed
+"""
+
+import pandas as pd
+import numpy as np
+import logging
+import hashlib
+import json
+import os
+from datetime import datetime
+from financial_metrics import PRESENT, ZERO, MISSING, STATE_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Covenant bounds: "min" is breached below the limit, "max" above it
+COVENANT_BOUNDS = ('min', 'max')
+
+# Thresholds under this key apply to every ticker without its own value for a covenant
+DEFAULT_KEY = "*"
+
+STATUS_COLUMNS = ['ticker', 'metric', 'period_type', 'bound', 'limit', 'period_end', 'value', 'state',
+                  'headroom', 'status']
+
+# Columns identifying one covenant of the portfolio
+COVENANT_KEY = ['ticker', 'metric', 'period_type', 'bound']
+
+
+def load_covenants(path):
+    """Read covenant thresholds from JSON into a (ticker, metric, period_type, bound, limit) frame
+
+    The file maps ticker -> metric -> {"min": limit} or {"max": limit}, with an optional
+    "period" ("quarterly" by default, "annual" or "ttm") to test, e.g.
+    ``{"*": {"Current Ratio": {"min": 1.2}}, "TSLA": {"Debt / EBITDA": {"max": 3.0, "period": "ttm"}}}``.
+    Thresholds under "*" apply to every ticker of the portfolio.
+    """
+    with open(path) as f:
+        config = json.load(f)
+
+    rows = []
+    for ticker, covenants in config.items():
+        for metric, terms in covenants.items():
+            for bound in COVENANT_BOUNDS:
+                if bound in terms:
+                    rows.append((ticker.upper() if ticker != DEFAULT_KEY else ticker, metric,
+                                 terms.get('period', 'quarterly'), bound, float(terms[bound])))
+
+    return pd.DataFrame(rows, columns=['ticker', 'metric', 'period_type', 'bound', 'limit'])
+
+
+def portfolio_thresholds(covenants, tickers):
+    """Thresholds of every ticker, defaults expanded and overridden by ticker-specific ones"""
+    defaults = covenants[covenants['ticker'] == DEFAULT_KEY].drop(columns='ticker')
+    expanded = defaults.merge(pd.DataFrame({'ticker': list(tickers)}), how='cross')
+
+    specific = covenants[covenants['ticker'].isin(tickers)]
+    thresholds = pd.concat([specific, expanded], ignore_index=True)
+    return thresholds.drop_duplicates(['ticker', 'metric', 'period_type', 'bound'], keep='first')
+
+
+def input_fingerprint(frames, thresholds=None):
+    """Hash of a ticker's statement frames (and thresholds) telling whether it must be re-evaluated"""
+    digest = hashlib.sha1()
+    for name, frame in sorted(frames.items()):
+        digest.update(name.encode())
+        if frame is not None and not frame.empty:
+            digest.update(pd.util.hash_pandas_object(frame, index=True).values.tobytes())
+            digest.update(','.join(map(str, frame.columns)).encode())
+
+    if thresholds is not None:
+        digest.update(thresholds.to_csv(index=False).encode())
+
+    return digest.hexdigest()
+
+
+def latest_metrics(metrics):
+    """Latest period of every metric as a (period_type, metric) -> period_end, value, state frame
+
+    ``metrics`` maps period type -> (values, states) frames, newest period first.
+    """
+    latest = []
+    for period_type, result in metrics.items():
+        if result is None or result[0].empty:
+            continue
+
+        values, states = result
+        latest.append(pd.DataFrame({
+            'period_type': period_type,
+            'metric': values.columns,
+            'period_end': values.index[0],
+            'value': values.iloc[0].to_numpy(dtype=float),
+            'state': states.iloc[0].to_numpy(),
+        }))
+
+    if not latest:
+        return pd.DataFrame(columns=['period_type', 'metric', 'period_end', 'value', 'state'])
+
+    return pd.concat(latest, ignore_index=True)
+
+
+def evaluate_covenants(thresholds, latest):
+    """Test every threshold against the latest metric values in one vectorized pass
+
+    ``latest`` is a frame of (ticker, period_type, metric, period_end, value, state).
+    Headroom is the relative distance to the limit, negative when breached; a
+    covenant whose metric is missing or undefined has status "unknown".
+    """
+    status = thresholds.merge(latest, on=['ticker', 'period_type', 'metric'], how='left')
+
+    value = status['value'].to_numpy(dtype=float)
+    limit = status['limit'].to_numpy(dtype=float)
+    sign = np.where(status['bound'] == 'min', 1.0, -1.0)
+
+    headroom = sign * (value - limit) / np.maximum(np.abs(limit), 1e-9)
+    known = status['state'].isin([PRESENT, ZERO]).to_numpy() & ~np.isnan(value)
+
+    status['headroom'] = np.where(known, headroom, np.nan)
+    status['status'] = np.select([~known, headroom < 0], ['unknown', 'breach'], 'pass')
+    status['state'] = status['state'].map(STATE_NAMES).fillna(STATE_NAMES[MISSING])
+    return status[STATUS_COLUMNS]
+
+
+class CovenantMonitor:
+    """Covenant status of a portfolio, kept in a state directory between scheduled runs
+
+    ``covenant_status.csv`` holds the current status of every covenant,
+    ``covenant_history.csv`` every evaluation made, and a fingerprint of each
+    ticker's inputs decides whether it is evaluated again on the next run.
+    """
+
+    def __init__(self, config_path, state_dir="./reports"):
+        self.config_path = config_path
+        self.covenants = load_covenants(config_path)
+        self.state_dir = state_dir
+        self.status_file = os.path.join(state_dir, "covenant_status.csv")
+        self.history_file = os.path.join(state_dir, "covenant_history.csv")
+        self.fingerprint_file = os.path.join(state_dir, "covenant_fingerprints.json")
+
+        os.makedirs(state_dir, exist_ok=True)
+
+        self.fingerprints = {}
+        if os.path.exists(self.fingerprint_file):
+            with open(self.fingerprint_file) as f:
+                self.fingerprints = json.load(f)
+
+        self.status = pd.DataFrame(columns=STATUS_COLUMNS)
+        if os.path.exists(self.status_file):
+            # Status files written before the column set was fixed may carry extra columns
+            self.status = pd.read_csv(self.status_file).reindex(columns=STATUS_COLUMNS)
+
+    def changed(self, statements):
+        """Fingerprints of the tickers whose statements or thresholds changed since the last run
+
+        ``statements`` maps ticker -> {name: DataFrame} of every frame the metrics are computed from.
+        """
+        thresholds = dict(tuple(portfolio_thresholds(self.covenants, list(statements)).groupby('ticker')))
+        fingerprints = {
+            ticker: input_fingerprint(frames, thresholds.get(ticker))
+            for ticker, frames in statements.items()
+        }
+        return {ticker: fingerprint for ticker, fingerprint in fingerprints.items()
+                if self.fingerprints.get(ticker) != fingerprint}
+
+    def update(self, metrics, fingerprints):
+        """Evaluate the changed tickers and merge them into the portfolio status
+
+        ``metrics`` maps ticker -> {period_type: (values, states)} for (at least) the
+        tickers in ``fingerprints``. Returns the current breaches of the whole portfolio.
+        """
+        tickers = [ticker for ticker in fingerprints if metrics.get(ticker) is not None]
+        logger.info(f"Evaluating covenants of {len(tickers)} changed tickers "
+                    f"({len(self.fingerprints)} previously evaluated)")
+
+        if tickers:
+            latest = pd.concat({ticker: latest_metrics(metrics[ticker]) for ticker in tickers},
+                               names=['ticker', None]).reset_index(level='ticker')
+            evaluated = evaluate_covenants(portfolio_thresholds(self.covenants, tickers), latest)
+
+            # Breaches that were passing (or unknown) at the previous evaluation
+            previous = self.status.set_index(COVENANT_KEY)['status']
+            keys = pd.MultiIndex.from_frame(evaluated[COVENANT_KEY])
+            new_breaches = keys[(evaluated['status'] == 'breach').to_numpy()
+                                & (previous.reindex(keys).to_numpy() != 'breach')]
+
+            self.status = pd.concat([self.status[~self.status['ticker'].isin(tickers)], evaluated[STATUS_COLUMNS]],
+                                    ignore_index=True)
+            self._save(evaluated, {ticker: fingerprints[ticker] for ticker in tickers})
+        else:
+            new_breaches = pd.MultiIndex.from_tuples([], names=COVENANT_KEY)
+
+        # Whether a breach is new is only reported, never stored with the status
+        breaches = self.status[self.status['status'] == 'breach']
+        breaches = breaches.assign(new=pd.MultiIndex.from_frame(breaches[COVENANT_KEY]).isin(new_breaches))
+        for _, breach in breaches.iterrows():
+            logger.warning(f"Covenant breach: {breach['ticker']} {breach['metric']} ({breach['period_type']}) "
+                           f"{breach['value']:.2f} vs {breach['bound']} {breach['limit']:.2f}")
+        logger.info(f"Covenants: {len(breaches)} breaches, "
+                    f"{(self.status['status'] == 'unknown').sum()} unknown of {len(self.status)}")
+        return breaches
+
+    def _save(self, evaluated, fingerprints):
+        """Persist the status, append the new evaluations to the history and store fingerprints"""
+        self.status.to_csv(self.status_file, index=False)
+
+        history = evaluated.assign(evaluated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"))
+        history.to_csv(self.history_file, mode='a', index=False, header=not os.path.exists(self.history_file))
+
+        self.fingerprints.update(fingerprints)
+        with open(self.fingerprint_file, 'w') as f:
+            json.dump(self.fingerprints, f, indent=2)
+
+    def write_breach_report(self, breaches, timestamp=None):
+        """Write the compact breach report of a run to a timestamped CSV file"""
+        timestamp = timestamp or datetime.now().strftime("%Y%m%d_%H%M%S")
+        report_file = os.path.join(self.state_dir, f"covenant_breaches_{timestamp}.csv")
+        breaches.to_csv(report_file, index=False)
+        logger.info(f"Covenant breach report saved to {report_file}")
+        return report_file
@@ -0,0 +1,126 @@
+"""
+Data-quality checks for fetched financial statements
+Validates accounting identities and field coverage across a universe before reports are rendered
+"""
+
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Accounting identities: name -> (section, left-hand field, [(sign, right-hand field), ...])
+IDENTITY_CHECKS = {
+    "Balance Sheet": ('balance_sheet', "Total Assets",
+                      [(1, "Total Liabilities Net Minority Interest"), (1, "Total Equity Gross Minority Interest")]),
+    "Gross Profit": ('income', "Gross Profit",
+                     [(1, "Total Revenue"), (-1, "Cost Of Revenue")]),
+    "Cash Flow": ('cashflow', "Changes In Cash",
+                  [(1, "Operating Cash Flow"), (1, "Investing Cash Flow"), (1, "Financing Cash Flow")]),
+}
+
+# Fields whose coverage is scored, per statement section
+COVERAGE_FIELDS = {
+    'balance_sheet': [
+        "Cash And Cash Equivalents", "Accounts Receivable", "Inventory", "Current Assets", "Total Assets",
+        "Accounts Payable", "Current Liabilities", "Long Term Debt", "Total Liabilities Net Minority Interest",
+    ],
+    'income': [
+        "Total Revenue", "Cost Of Revenue", "Gross Profit", "EBIT", "Interest Expense", "Tax Provision", "Net Income",
+    ],
+    'cashflow': [
+        "Net Income", "Depreciation", "Operating Cash Flow", "Capital Expenditure",
+        "Investing Cash Flow", "Financing Cash Flow",
+    ],
+}
+
+# Share of the quality score carried by field coverage; identities share the rest
+COVERAGE_WEIGHT = 0.4
+
+
+def stack_statements(statements, section, periods=3):
+    """Stack one statement section of every ticker into a (ticker, period) x field frame"""
+    frames = {
+        ticker: frames[section].iloc[:, :periods].T
+        for ticker, frames in statements.items()
+        if frames.get(section) is not None and not frames[section].empty
+    }
+    if not frames:
+        return pd.DataFrame(index=pd.MultiIndex.from_tuples([], names=['ticker', 'period']))
+
+    stacked = pd.concat(frames, names=['ticker', 'period'])
+    return stacked.apply(pd.to_numeric, errors='coerce').astype(float)
+
+
+def identity_residuals(statements, periods=3):
+    """Relative residual of every accounting identity per (ticker, period)
+
+    NaN where an identity cannot be checked because one of its fields is missing.
+    """
+    residuals = {}
+
+    for name, (section, lhs_field, rhs_terms) in IDENTITY_CHECKS.items():
+        stacked = stack_statements(statements, section, periods)
+        fields = stacked.reindex(columns=[lhs_field] + [field for _, field in rhs_terms])
+
+        if section == 'balance_sheet' and "Stockholders Equity" in stacked.columns:
+            # Some filers only report equity excluding minority interest
+            equity = "Total Equity Gross Minority Interest"
+            fields[equity] = fields[equity].fillna(stacked["Stockholders Equity"])
+
+        lhs = fields[lhs_field]
+        rhs = sum(sign * fields[field] for sign, field in rhs_terms)
+        residuals[name] = (lhs - rhs).abs() / lhs.abs().clip(lower=1.0)
+
+    return pd.DataFrame(residuals)
+
+
+def field_coverage(statements, periods=3):
+    """Share of non-missing values of every scored field per ticker"""
+    coverage = []
+
+    for section, fields in COVERAGE_FIELDS.items():
+        stacked = stack_statements(statements, section, periods).reindex(columns=fields)
+        section_coverage = stacked.notna().groupby(level='ticker').mean()
+        section_coverage.columns = pd.MultiIndex.from_product([[section], section_coverage.columns])
+        coverage.append(section_coverage)
+
+    return pd.concat(coverage, axis=1).reindex(list(statements)).fillna(0.0)
+
+
+def assess_quality(statements, periods=3, tolerance=0.01):
+    """Per-ticker quality report: coverage, identity pass rates and a 0-100 score
+
+    ``statements`` maps ticker -> {'balance_sheet', 'income', 'cashflow': DataFrame},
+    as for the metric panel. An identity passes when its relative residual is
+    within ``tolerance``; identities that cannot be checked count as failures.
+    """
+    tickers = list(statements)
+    residuals = identity_residuals(statements, periods)
+
+    passed = (residuals <= tolerance).groupby(level='ticker').mean() if not residuals.empty else None
+    quality = pd.DataFrame(index=pd.Index(tickers, name='ticker'))
+    quality['Coverage'] = field_coverage(statements, periods).mean(axis=1)
+
+    for name in IDENTITY_CHECKS:
+        column = f"{name} Identity"
+        quality[column] = passed[name].reindex(tickers).fillna(0.0) if passed is not None else 0.0
+
+    identities = quality[[f"{name} Identity" for name in IDENTITY_CHECKS]].mean(axis=1)
+    quality['Quality Score'] = 100 * (COVERAGE_WEIGHT * quality['Coverage'] + (1 - COVERAGE_WEIGHT) * identities)
+
+    return quality
+
+
+def combine_quality(reports):
+    """Average quality reports of several period types (quarterly, annual) per ticker"""
+    return pd.concat(reports).groupby(level='ticker', sort=False).mean()
+
+
+def log_quality(quality, min_score=None):
+    """Log every ticker's score, warning about those below ``min_score``"""
+    for ticker, report in quality.iterrows():
+        detail = ", ".join(f"{name} {value:.0%}" for name, value in report.drop('Quality Score').items())
+        if min_score is not None and report['Quality Score'] < min_score:
+            logger.warning(f"Data quality for {ticker}: {report['Quality Score']:.0f}/100 below {min_score} ({detail})")
+        else:
+            logger.info(f"Data quality for {ticker}: {report['Quality Score']:.0f}/100 ({detail})")
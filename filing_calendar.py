@@ -0,0 +1,122 @@
+"""
+Filing-calendar-driven fetch scheduling
+Polls a ticker often only in a window after its expected earnings filing and rarely otherwise
+"""
+
+import pandas as pd
+import logging
+import json
+import os
+
+logger = logging.getLogger(__name__)
+
+# Days after an expected filing during which a ticker is polled intensively
+POLL_WINDOW = pd.Timedelta(days=14)
+
+# Minimum time between two polls inside the window and outside it (heartbeat)
+POLL_INTERVAL = pd.Timedelta(hours=6)
+HEARTBEAT = pd.Timedelta(days=14)
+
+# Without a calendar entry, a quarter is expected this long after it ends
+FILING_LAG = pd.Timedelta(days=30)
+
+# A filing covers the latest period ending at most this long before it (10-Ks included)
+MAX_FILING_LAG = pd.Timedelta(days=100)
+
+
+def load_filing_calendar(path):
+    """Read expected filing dates per ticker from a CSV (ticker,date columns) or JSON file
+
+    JSON files map ticker -> date or list of dates. Returns ticker -> sorted DatetimeIndex.
+    """
+    if path.lower().endswith('.json'):
+        with open(path) as f:
+            entries = json.load(f)
+        rows = [(ticker, date) for ticker, dates in entries.items()
+                for date in (dates if isinstance(dates, list) else [dates])]
+        table = pd.DataFrame(rows, columns=['ticker', 'date'])
+    else:
+        table = pd.read_csv(path)
+
+    table['ticker'] = table['ticker'].str.upper()
+    table['date'] = pd.to_datetime(table['date'])
+    return {ticker: pd.DatetimeIndex(dates['date']).sort_values() for ticker, dates in table.groupby('ticker')}
+
+
+class FilingScheduler:
+    """Decides which tickers are due for a fetch at each scheduler tick
+
+    A ticker is due every ``POLL_INTERVAL`` from its expected filing date until
+    the new quarter shows up in its statements (or ``POLL_WINDOW`` passes), and
+    every ``HEARTBEAT`` otherwise. Poll times and the latest quarter seen are
+    kept in a JSON state file so restarts do not trigger a full re-fetch.
+    """
+
+    def __init__(self, calendar=None, state_file="./reports/fetch_schedule.json"):
+        self.calendar = calendar or {}
+        self.state_file = state_file
+
+        self.state = {}
+        if os.path.exists(state_file):
+            with open(state_file) as f:
+                self.state = json.load(f)
+
+    def expected_filing(self, ticker, now):
+        """Expected filing date whose polling window is open or still ahead, or None"""
+        latest_quarter = self._timestamp(ticker, 'latest_quarter')
+
+        dates = self.calendar.get(ticker)
+        if dates is not None:
+            upcoming = dates[dates + POLL_WINDOW >= now]
+            return upcoming[0] if len(upcoming) else None
+
+        # Estimated from the statements: the quarter after the latest one, plus the filing lag
+        if latest_quarter is not None:
+            return latest_quarter + pd.DateOffset(months=3) + FILING_LAG
+        return None
+
+    def in_window(self, ticker, now):
+        """True while the expected filing of a ticker is due and not yet in its statements"""
+        expected = self.expected_filing(ticker, now)
+        if expected is None or not expected <= now <= expected + POLL_WINDOW:
+            return False
+
+        latest_quarter = self._timestamp(ticker, 'latest_quarter')
+        return latest_quarter is None or latest_quarter < expected - MAX_FILING_LAG
+
+    def due(self, tickers, now=None):
+        """Tickers to fetch now: those never polled, in their filing window or past their heartbeat"""
+        now = pd.Timestamp(now or pd.Timestamp.now())
+
+        due = []
+        for ticker in tickers:
+            last_poll = self._timestamp(ticker, 'last_poll')
+            interval = POLL_INTERVAL if self.in_window(ticker, now) else HEARTBEAT
+            if last_poll is None or now - last_poll >= interval:
+                due.append(ticker)
+
+        logger.info(f"{len(due)}/{len(tickers)} tickers due for a fetch")
+        return due
+
+    def record(self, polled, latest_quarters, now=None):
+        """Store the poll time of the fetched tickers and the latest quarter each reported"""
+        now = pd.Timestamp(now or pd.Timestamp.now())
+
+        for ticker in polled:
+            entry = self.state.setdefault(ticker, {})
+            entry['last_poll'] = now.isoformat()
+
+            latest_quarter = latest_quarters.get(ticker)
+            if latest_quarter is not None:
+                previous = self._timestamp(ticker, 'latest_quarter')
+                if previous is not None and latest_quarter > previous:
+                    logger.info(f"New quarter {latest_quarter:%m/%d/%Y} for {ticker}")
+                entry['latest_quarter'] = pd.Timestamp(latest_quarter).isoformat()
+
+        os.makedirs(os.path.dirname(self.state_file) or '.', exist_ok=True)
+        with open(self.state_file, 'w') as f:
+            json.dump(self.state, f, indent=2)
+
+    def _timestamp(self, ticker, key):
+        value = self.state.get(ticker, {}).get(key)
+        return pd.Timestamp(value) if value else None
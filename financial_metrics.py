@@ -0,0 +1,475 @@
+"""
+Vectorized financial metrics for the report generator
+Computes ratios and margins from yfinance statement frames, for one ticker or a whole universe
+"""
+
+import numpy as np
+import pandas as pd
+import logging
+from period_alignment import fiscal_frequency, fiscal_periods
+
+logger = logging.getLogger(__name__)
+
+# Statement rows needed by the ratio and margin calculations
+BALANCE_SHEET_FIELDS = [
+    "Current Assets",
+    "Current Liabilities",
+    "Inventory",
+    "Total Assets",
+    "Total Liabilities Net Minority Interest",
+]
+
+INCOME_FIELDS = [
+    "Total Revenue",
+    "Gross Profit",
+    "EBIT",
+    "Net Income",
+]
+
+# Statement rows needed by the per-share metrics
+PER_SHARE_FIELDS = [
+    "Ordinary Shares Number",
+    "Diluted Average Shares",
+    "Basic Average Shares",
+    "Stockholders Equity",
+    "Goodwill And Other Intangible Assets",
+    "Total Assets",
+    "Total Liabilities Net Minority Interest",
+    "Net Income",
+    "Operating Cash Flow",
+    "Capital Expenditure",
+]
+
+PER_SHARE_METRICS = ["Book Value Per Share", "Tangible Book Value Per Share", "EPS", "FCF Per Share"]
+
+# Statement rows needed by the cash analytics
+CASH_FIELDS = [
+    "Cash And Cash Equivalents",
+    "Other Short Term Investments",
+    "Total Revenue",
+    "Net Income",
+    "Operating Cash Flow",
+    "Capital Expenditure",
+]
+
+CASH_METRICS = ["Free Cash Flow", "FCF Margin", "Cash Conversion", "Capex Intensity", "Cash Runway (Months)"]
+
+# Statement rows needed by the working-capital cycle
+WORKING_CAPITAL_FIELDS = [
+    "Accounts Receivable",
+    "Inventory",
+    "Accounts Payable",
+    "Total Revenue",
+    "Cost Of Revenue",
+]
+
+WORKING_CAPITAL_METRICS = ["DSO (Days)", "DIO (Days)", "DPO (Days)", "Cash Conversion Cycle (Days)"]
+
+DAYS_PER_MONTH = 365 / 12
+
+# Income and cash-flow rows that are period averages or rates, so TTM averages them instead of summing
+AVERAGED_FLOW_FIELDS = ["Basic Average Shares", "Diluted Average Shares", "Tax Rate For Calcs"]
+
+# Statement rows needed by the leverage and coverage metrics
+CREDIT_FIELDS = [
+    "EBIT",
+    "Interest Expense",
+    "Total Debt",
+    "Short Term Debt",
+    "Long Term Debt",
+    "Cash And Cash Equivalents",
+    "Other Short Term Investments",
+    "Stockholders Equity",
+    "Total Assets",
+    "Total Liabilities Net Minority Interest",
+]
+
+# Cash-flow rows holding depreciation, most complete first
+DEPRECIATION_FIELDS = ["Depreciation And Amortization", "Depreciation"]
+
+CREDIT_METRICS = ["Interest Coverage", "EBITDA", "Net Debt", "Debt / EBITDA", "Net Debt / EBITDA",
+                  "Total Debt / Capital"]
+
+# Credit metrics ranked in peer comparisons (amounts are not comparable across tickers)
+CREDIT_RATIOS = ["Interest Coverage", "Debt / EBITDA", "Net Debt / EBITDA", "Total Debt / Capital"]
+
+# Metrics shown as percentages rather than plain ratios
+PERCENT_METRICS = ["Gross Profit Margin", "EBIT Margin", "Net Income Margin", "Total Debt / Capital"]
+
+# State codes carried alongside metric values (int8 frames of the same shape)
+PRESENT = 0
+ZERO = 1
+MISSING = 2      # an input is not reported
+UNDEFINED = 3    # the divisor is zero
+
+STATE_NAMES = {PRESENT: "present", ZERO: "zero", MISSING: "missing", UNDEFINED: "undefined"}
+
+# Text written in place of values that have no number
+STATE_LABELS = {MISSING: "n/a", UNDEFINED: "n/m"}
+
+
+def statement_values(dataframe, fields, column=0):
+    """Return the given fields from one statement column as a float Series"""
+    if dataframe is None or len(dataframe.columns) <= column:
+        return pd.Series(np.nan, index=fields, dtype=float)
+
+    values = dataframe.iloc[:, column].reindex(fields)
+    return pd.to_numeric(values, errors='coerce').astype(float)
+
+
+def value_states(values):
+    """State code of every value of a frame: present, zero or missing"""
+    array = values.to_numpy(dtype=float)
+    states = np.select([np.isnan(array), array == 0], [MISSING, ZERO], PRESENT).astype(np.int8)
+    return pd.DataFrame(states, index=values.index, columns=values.columns)
+
+
+def masked_divide(numerators, denominators):
+    """Divide two frames, keeping missing inputs apart from zero divisors
+
+    Returns (values, states); values are NaN wherever the state is MISSING or UNDEFINED.
+    """
+    values = numerators / denominators.where(denominators != 0)
+
+    array = values.to_numpy(dtype=float)
+    undefined = (denominators.to_numpy(dtype=float) == 0) & ~np.isnan(numerators.to_numpy(dtype=float))
+    states = np.select([undefined, np.isnan(array), array == 0], [UNDEFINED, MISSING, ZERO], PRESENT).astype(np.int8)
+
+    return values, pd.DataFrame(states, index=values.index, columns=values.columns)
+
+
+def compute_masked_ratios(raw):
+    """Compute ratios and margins column-wise over a frame of raw statement fields
+
+    Each row of ``raw`` is one observation (a ticker, a period, ...) and each
+    column one statement field, so the whole frame is computed in one pass.
+    Returns (values, states) frames of identical shape.
+    """
+    raw = raw.reindex(columns=BALANCE_SHEET_FIELDS + INCOME_FIELDS)
+
+    current_assets = raw["Current Assets"]
+    current_liabilities = raw["Current Liabilities"]
+    # A balance sheet without an inventory line holds no inventory
+    inventory = raw["Inventory"].fillna(0)
+    total_liabilities = raw["Total Liabilities Net Minority Interest"]
+    net_worth = raw["Total Assets"] - total_liabilities
+    revenue = raw["Total Revenue"]
+
+    numerators = pd.DataFrame({
+        "Current Ratio": current_assets,
+        "Quick Ratio": current_assets - inventory,
+        "Debt to Equity Ratio": total_liabilities,
+        "Gross Profit Margin": raw["Gross Profit"],
+        "EBIT Margin": raw["EBIT"],
+        "Net Income Margin": raw["Net Income"],
+    }, index=raw.index)
+    denominators = pd.DataFrame({
+        "Current Ratio": current_liabilities,
+        "Quick Ratio": current_liabilities,
+        "Debt to Equity Ratio": net_worth,
+        "Gross Profit Margin": revenue,
+        "EBIT Margin": revenue,
+        "Net Income Margin": revenue,
+    }, index=raw.index)
+
+    return masked_divide(numerators, denominators)
+
+
+def compute_ratios(raw):
+    """Ratios and margins of a frame of raw statement fields, NaN where not computable"""
+    values, states = compute_masked_ratios(raw)
+    return values
+
+
+def compute_metric_panel(statements, column=0):
+    """Build a ticker x metric frame for a universe of fetched statements
+
+    ``statements`` maps ticker -> {'balance_sheet', 'income', 'cashflow': DataFrame};
+    without a cash-flow statement the EBITDA-based ratios are missing.
+    """
+    raw = pd.DataFrame({
+        ticker: pd.concat([
+            statement_values(frames.get('balance_sheet'), BALANCE_SHEET_FIELDS, column),
+            statement_values(frames.get('income'), INCOME_FIELDS, column),
+            statement_values(frames.get('balance_sheet'), CREDIT_FIELDS, column),
+            statement_values(frames.get('income'), CREDIT_FIELDS, column),
+        ])
+        for ticker, frames in statements.items()
+    }).T
+    # Each credit field comes from whichever statement reports it
+    raw = raw.T.groupby(level=0, sort=False).first().T
+
+    depreciation = pd.Series({
+        ticker: statement_values(frames.get('cashflow'), DEPRECIATION_FIELDS, column).bfill().iloc[0]
+        for ticker, frames in statements.items()
+    }, dtype=float)
+    credit, _ = compute_credit_metrics(raw, depreciation.reindex(raw.index))
+
+    return pd.concat([compute_ratios(raw), credit[CREDIT_RATIOS]], axis=1)
+
+
+def peer_statistics(panel, groups):
+    """Percentile rank and z-score of every metric within each peer group
+
+    ``groups`` maps group name -> list of tickers; a ticker may belong to
+    several groups. Returns a frame indexed by (group, ticker) with
+    ('Value' | 'Percentile' | 'Z-Score', metric) columns.
+    """
+    membership = pd.DataFrame(
+        [(group, ticker) for group, tickers in groups.items() for ticker in tickers if ticker in panel.index],
+        columns=['group', 'ticker'],
+    )
+    if membership.empty:
+        logger.warning("No peer group members have fetched data")
+        return None
+
+    values = panel.loc[membership['ticker']]
+    values.index = pd.MultiIndex.from_frame(membership)
+
+    grouped = values.groupby(level='group')
+    percentile = grouped.rank(pct=True)
+    z_score = (values - grouped.transform('mean')) / grouped.transform('std').replace(0, np.nan)
+
+    return pd.concat({'Value': values, 'Percentile': percentile, 'Z-Score': z_score}, axis=1)
+
+
+def trailing_twelve_months(dataframe, stock=False, window=4, freq='Q-DEC'):
+    """Trailing-window view of a quarterly statement (newest column first)
+
+    Flow items (income, cash flow) are summed over the window; stock items
+    (balance sheet) and the averages and rates of ``AVERAGED_FLOW_FIELDS`` are
+    averaged. The window covers ``window`` consecutive fiscal quarters of ``freq``,
+    so periods without a full window, or with a quarter absent, are NaN.
+    """
+    if dataframe is None or dataframe.empty:
+        return None
+
+    chronological = dataframe.T.sort_index().apply(pd.to_numeric, errors='coerce')
+    dates = chronological.index
+    periods = fiscal_periods(dates, freq)
+
+    # Absent quarters become empty rows, so a window never spans more than a year
+    chronological.index = periods
+    chronological = chronological[~chronological.index.duplicated(keep='last')]
+    chronological = chronological.reindex(pd.period_range(periods.min(), periods.max(), freq=freq))
+
+    rolling = chronological.rolling(window, min_periods=window)
+    trailing = rolling.mean()
+    if not stock:
+        averaged = trailing.columns.intersection(AVERAGED_FLOW_FIELDS)
+        trailing = rolling.sum().assign(**{field: trailing[field] for field in averaged})
+
+    # Reported quarters keep their period-end dates
+    trailing = trailing.reindex(periods)
+    trailing.index = dates
+    return trailing.sort_index(ascending=False).T
+
+
+def compute_per_share(raw):
+    """Book value, tangible book value, EPS and free cash flow per share, column-wise
+
+    Book values use period-end shares outstanding; EPS uses diluted (else basic)
+    average shares where reported. TTM frames carry four-quarter averages of the
+    share counts (see ``trailing_twelve_months``), so TTM EPS is TTM net income
+    over average shares. Returns (values, states) frames.
+    """
+    raw = raw.reindex(columns=PER_SHARE_FIELDS)
+
+    shares = raw["Ordinary Shares Number"]
+    average_shares = raw["Diluted Average Shares"].fillna(raw["Basic Average Shares"]).fillna(shares)
+    equity = raw["Stockholders Equity"].fillna(raw["Total Assets"] - raw["Total Liabilities Net Minority Interest"])
+    # No goodwill line means no intangibles to deduct
+    tangible_equity = equity - raw["Goodwill And Other Intangible Assets"].fillna(0)
+
+    numerators = pd.DataFrame({
+        "Book Value Per Share": equity,
+        "Tangible Book Value Per Share": tangible_equity,
+        "EPS": raw["Net Income"],
+        "FCF Per Share": raw["Operating Cash Flow"] + raw["Capital Expenditure"],
+    }, index=raw.index)
+    denominators = pd.DataFrame({
+        "Book Value Per Share": shares,
+        "Tangible Book Value Per Share": shares,
+        "EPS": average_shares,
+        "FCF Per Share": shares,
+    }, index=raw.index)
+
+    return masked_divide(numerators, denominators)
+
+
+def compute_cash_analytics(raw, period_months=3):
+    """Free cash flow, FCF margin, cash conversion, capex intensity and cash runway, column-wise
+
+    ``period_months`` is the length of each observation's period (3 for
+    quarters, 12 for years and TTM). The runway is liquid assets over the
+    monthly free cash burn; it is undefined when free cash flow is not negative.
+    Returns (values, states) frames.
+    """
+    raw = raw.reindex(columns=CASH_FIELDS)
+
+    operating = raw["Operating Cash Flow"]
+    capex = raw["Capital Expenditure"]
+    free_cash_flow = operating + capex
+    revenue = raw["Total Revenue"]
+    liquid_assets = raw["Cash And Cash Equivalents"] + raw["Other Short Term Investments"].fillna(0)
+    monthly_burn = (-free_cash_flow).clip(lower=0) / period_months
+
+    values, states = masked_divide(
+        pd.DataFrame({
+            "FCF Margin": free_cash_flow,
+            "Cash Conversion": operating,
+            "Capex Intensity": -capex,
+            "Cash Runway (Months)": liquid_assets,
+        }, index=raw.index),
+        pd.DataFrame({
+            "FCF Margin": revenue,
+            "Cash Conversion": raw["Net Income"],
+            "Capex Intensity": revenue,
+            "Cash Runway (Months)": monthly_burn,
+        }, index=raw.index),
+    )
+
+    free_cash_flow = free_cash_flow.to_frame("Free Cash Flow")
+    return (pd.concat([free_cash_flow, values], axis=1),
+            pd.concat([value_states(free_cash_flow), states], axis=1))
+
+
+def previous_period(frame, freq='Q-DEC'):
+    """Values of the fiscal period preceding each row's period (rows indexed by period-end date)
+
+    Periods are matched on the fiscal ``freq``, not by position, so a row whose
+    preceding period was dropped (e.g. an empty quarter) gets NaN. Rows indexed
+    by (ticker, period end) are matched within each ticker.
+    """
+    if isinstance(frame.index, pd.MultiIndex):
+        shifted = [previous_period(group.droplevel(0), freq).set_axis(group.index)
+                   for _, group in frame.groupby(level=0, sort=False)]
+        return pd.concat(shifted).reindex(frame.index)
+
+    periods = fiscal_periods(frame.index, freq)
+    by_period = frame.set_axis(periods)
+    by_period = by_period[~by_period.index.duplicated()]
+    return by_period.reindex(periods - 1).set_axis(frame.index)
+
+
+def compute_working_capital_cycle(raw, period_months=3, average_balances=True, freq='Q-DEC'):
+    """Days sales outstanding, inventory, payables and the cash conversion cycle, column-wise
+
+    Balances are averaged with the preceding fiscal period of ``freq``, so a
+    period whose predecessor is not in ``raw`` is missing. Pass
+    ``average_balances=False`` for balances that are already averages, such as
+    TTM frames. Returns (values, states) frames.
+    """
+    raw = raw.reindex(columns=WORKING_CAPITAL_FIELDS)
+    # A balance sheet without an inventory line holds no inventory (a gap in one period stays missing)
+    inventory = raw["Inventory"]
+    if isinstance(raw.index, pd.MultiIndex):
+        inventory = inventory.where(inventory.notna().groupby(level=0, sort=False).transform('any'), 0)
+    elif inventory.isna().all():
+        inventory = inventory.fillna(0)
+    balances = raw[["Accounts Receivable", "Accounts Payable"]].assign(Inventory=inventory)
+    if average_balances:
+        balances = (balances + previous_period(balances, freq)) / 2
+
+    days = period_months * DAYS_PER_MONTH
+    values, states = masked_divide(
+        pd.DataFrame({
+            "DSO (Days)": balances["Accounts Receivable"] * days,
+            "DIO (Days)": balances["Inventory"] * days,
+            "DPO (Days)": balances["Accounts Payable"] * days,
+        }, index=raw.index),
+        pd.DataFrame({
+            "DSO (Days)": raw["Total Revenue"],
+            "DIO (Days)": raw["Cost Of Revenue"],
+            "DPO (Days)": raw["Cost Of Revenue"],
+        }, index=raw.index),
+    )
+
+    cycle = (values["DSO (Days)"] + values["DIO (Days)"] - values["DPO (Days)"]).to_frame("Cash Conversion Cycle (Days)")
+    # The cycle takes the worst state of its parts (undefined over missing)
+    worst = states.max(axis=1).to_numpy()
+    cycle_states = value_states(cycle)
+    cycle_states.iloc[:, 0] = np.where(worst >= MISSING, worst, cycle_states.iloc[:, 0]).astype(np.int8)
+
+    return pd.concat([values, cycle], axis=1), pd.concat([states, cycle_states], axis=1)
+
+
+def compute_credit_metrics(raw, depreciation, period_months=3):
+    """Interest coverage, EBITDA, net debt and leverage multiples, column-wise
+
+    ``depreciation`` is a Series aligned with ``raw`` taken from the cash-flow
+    statement. Debt multiples use EBITDA annualized from the period length.
+    Returns (values, states) frames.
+    """
+    raw = raw.reindex(columns=CREDIT_FIELDS)
+
+    ebitda = raw["EBIT"] + depreciation
+    # Filers without a total debt line report its short- and long-term parts
+    total_debt = raw["Total Debt"].fillna(raw["Short Term Debt"].fillna(0) + raw["Long Term Debt"])
+    net_debt = total_debt - (raw["Cash And Cash Equivalents"] + raw["Other Short Term Investments"].fillna(0))
+    equity = raw["Stockholders Equity"].fillna(raw["Total Assets"] - raw["Total Liabilities Net Minority Interest"])
+    annual_ebitda = ebitda * (12 / period_months)
+
+    values, states = masked_divide(
+        pd.DataFrame({
+            "Interest Coverage": raw["EBIT"],
+            "Debt / EBITDA": total_debt,
+            "Net Debt / EBITDA": net_debt,
+            "Total Debt / Capital": total_debt,
+        }, index=raw.index),
+        pd.DataFrame({
+            "Interest Coverage": raw["Interest Expense"].abs(),
+            "Debt / EBITDA": annual_ebitda,
+            "Net Debt / EBITDA": annual_ebitda,
+            "Total Debt / Capital": total_debt + equity,
+        }, index=raw.index),
+    )
+
+    totals = pd.DataFrame({"EBITDA": ebitda, "Net Debt": net_debt}, index=raw.index)
+    values = pd.concat([values, totals], axis=1)[CREDIT_METRICS]
+    states = pd.concat([states, value_states(totals)], axis=1)[CREDIT_METRICS]
+    return values, states
+
+
+def period_metrics(balance_sheet, income, cashflow, period_months=3, average_balances=True, freq=None):
+    """Ratios, margins, derived totals and analytics per period (rows are periods, newest first)
+
+    Works on quarterly, annual or TTM statement frames alike (TTM balances
+    are already averages, so pass ``average_balances=False``). ``freq`` is the
+    fiscal period frequency, calendar quarters or years by default. Returns
+    (values, states) frames; states tell zero, missing and undefined apart.
+    """
+    if freq is None:
+        freq = fiscal_frequency('annual' if period_months == 12 else 'quarterly')
+
+    frames = [frame for frame in (balance_sheet, income, cashflow) if frame is not None]
+    if not frames:
+        return None
+
+    raw = pd.concat(frames).T.sort_index(ascending=False)
+    raw = raw.loc[:, ~raw.columns.duplicated()].apply(pd.to_numeric, errors='coerce')
+    values, states = compute_masked_ratios(raw)
+
+    # Totals are missing as soon as one of their inputs is
+    totals = raw.reindex(columns=BALANCE_SHEET_FIELDS + ["Operating Cash Flow", "Investing Cash Flow",
+                                                          "Financing Cash Flow"])
+    totals = pd.DataFrame({
+        "Working Capital": totals["Current Assets"] - totals["Current Liabilities"],
+        "Net Worth (OE)": totals["Total Assets"] - totals["Total Liabilities Net Minority Interest"],
+        "Net Cash Flow": totals["Operating Cash Flow"] + totals["Investing Cash Flow"] + totals["Financing Cash Flow"],
+    }, index=raw.index)
+
+    per_share, per_share_states = compute_per_share(raw)
+    cash, cash_states = compute_cash_analytics(raw, period_months)
+    cycle, cycle_states = compute_working_capital_cycle(raw, period_months, average_balances, freq)
+
+    # Depreciation comes from the cash-flow statement so EBITDA adds back all of it
+    depreciation = pd.Series(float('nan'), index=raw.index)
+    if cashflow is not None:
+        reported = cashflow.T.reindex(columns=DEPRECIATION_FIELDS).apply(pd.to_numeric, errors='coerce')
+        depreciation = reported.bfill(axis=1).iloc[:, 0].reindex(raw.index)
+    credit, credit_states = compute_credit_metrics(raw, depreciation, period_months)
+
+    return (pd.concat([values, totals, per_share, cash, cycle, credit], axis=1),
+            pd.concat([states, value_states(totals), per_share_states, cash_states, cycle_states, credit_states],
+                      axis=1))
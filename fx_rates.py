@@ -0,0 +1,102 @@
+"""
+Currency normalization for fetched financial statements
+Converts statements into one reporting currency from a local FX rate table
+"""
+
+import pandas as pd
+import logging
+
+logger = logging.getLogger(__name__)
+
+# Accounting-format symbol of common reporting currencies (others use the ISO code)
+CURRENCY_SYMBOLS = {'USD': '$', 'EUR': '€', 'GBP': '£', 'JPY': '¥', 'CNY': '¥', 'INR': '₹'}
+
+# Length of the averaging window of each period type
+PERIOD_LENGTHS = {'quarterly': pd.DateOffset(months=3), 'annual': pd.DateOffset(years=1),
+                  'ttm': pd.DateOffset(years=1)}
+
+# Rows that are counts or rates rather than amounts and are never converted
+NON_CURRENCY_FIELDS = [
+    "Ordinary Shares Number", "Share Issued", "Treasury Shares Number",
+    "Basic Average Shares", "Diluted Average Shares", "Tax Rate For Calcs",
+]
+
+# Balances are translated at the period-end rate, flows at the period-average rate
+SECTION_RATE_METHODS = {'balance_sheet': 'end', 'income': 'average', 'cashflow': 'average'}
+
+
+class FxRateTable:
+    """Exchange rates read from a CSV file with currency, date and rate columns
+
+    ``rate`` is the number of reporting-currency units per unit of ``currency``
+    on ``date``. Lookups are memoized per (currency, date, method).
+    """
+
+    def __init__(self, path, reporting_currency="USD"):
+        self.path = path
+        self.reporting_currency = reporting_currency.upper()
+
+        table = pd.read_csv(path, parse_dates=['date'])
+        table['currency'] = table['currency'].str.upper()
+        self.rates = {
+            currency: rates.set_index('date')['rate'].sort_index()
+            for currency, rates in table.groupby('currency')
+        }
+        self._cache = {}
+
+    def rate(self, currency, date, method='end', period_type='quarterly'):
+        """Rate on a period end (latest quote on or before it) or averaged over the period"""
+        currency = currency.upper()
+        if currency == self.reporting_currency:
+            return 1.0
+
+        key = (currency, pd.Timestamp(date), method, period_type)
+        if key not in self._cache:
+            self._cache[key] = self._lookup(*key)
+
+        return self._cache[key]
+
+    def _lookup(self, currency, date, method, period_type):
+        rates = self.rates.get(currency)
+        if rates is None:
+            return float('nan')
+
+        if method == 'average':
+            window = rates[(rates.index > date - PERIOD_LENGTHS[period_type]) & (rates.index <= date)]
+            if not window.empty:
+                return float(window.mean())
+
+        # Period-end rate, also used when no quotes fall inside the averaging window
+        return float(rates.asof(date)) if date >= rates.index[0] else float('nan')
+
+    def convert(self, frame, currency, method='end', period_type='quarterly'):
+        """Convert a statement frame (fields x period-end dates) into the reporting currency"""
+        if frame is None or currency.upper() == self.reporting_currency:
+            return frame
+
+        rates = pd.Series([self.rate(currency, date, method, period_type) for date in frame.columns],
+                          index=frame.columns)
+        if rates.isna().any():
+            logger.warning(f"No {currency}/{self.reporting_currency} rate for "
+                           f"{', '.join(f'{date:%m/%d/%Y}' for date in rates.index[rates.isna()])}")
+
+        # One rate per period, broadcast across every amount field
+        converted = frame.apply(pd.to_numeric, errors='coerce')
+        amounts = ~converted.index.isin(NON_CURRENCY_FIELDS)
+        converted.loc[amounts] = converted.loc[amounts] * rates
+        return converted
+
+    def convert_statements(self, frames, currency, period_type='quarterly'):
+        """Convert {section: frame} statements with the rate method of each section"""
+        return {
+            section: self.convert(frame, currency, SECTION_RATE_METHODS.get(section, 'end'), period_type)
+            for section, frame in frames.items()
+        }
+
+
+def currency_number_format(currency="USD"):
+    """Accounting number format showing the symbol of the reporting currency"""
+    # "$" is a literal in Excel formats; other symbols and codes are quoted
+    symbol = '$' if currency == 'USD' else f'"{CURRENCY_SYMBOLS.get(currency, currency + " ")}"'
+
+    return f'_({symbol}* #,##0_);_({symbol}* (#,##0);_({symbol}* "-"??_);_(@_)'
@@ -0,0 +1,119 @@
+"""
+Period alignment for fetched financial statements
+Reindexes balance sheet, income and cash flow frames to one shared fiscal period index
+"""
+
+import pandas as pd
+import logging
+import json
+
+logger = logging.getLogger(__name__)
+
+# Period frequency of each statement type (anchored to the fiscal year-end month)
+PERIOD_FREQUENCIES = {'quarterly': 'Q', 'annual': 'Y'}
+
+MONTHS = ['JAN', 'FEB', 'MAR', 'APR', 'MAY', 'JUN', 'JUL', 'AUG', 'SEP', 'OCT', 'NOV', 'DEC']
+
+# 52/53-week fiscal years end up to a week into the next month (e.g. 02/01 for January)
+PERIOD_END_GRACE = pd.Timedelta(days=7)
+
+# Fiscal year-end month per ticker, seeded from a table or derived once per process
+FISCAL_YEAR_ENDS = {}
+
+
+def load_fiscal_calendar(path):
+    """Seed the fiscal year-end table from a JSON file mapping ticker -> month (1-12)"""
+    with open(path) as f:
+        FISCAL_YEAR_ENDS.update({ticker.upper(): int(month) for ticker, month in json.load(f).items()})
+
+
+def fiscal_year_end(ticker, annual_frames):
+    """Fiscal year-end month of a ticker, derived from its annual statement dates"""
+    if ticker in FISCAL_YEAR_ENDS:
+        return FISCAL_YEAR_ENDS[ticker]
+
+    dates = [date for frame in annual_frames if frame is not None for date in pd.to_datetime(frame.columns)]
+    if not dates:
+        # Without annual statements assume calendar years, but derive again next time
+        return 12
+
+    FISCAL_YEAR_ENDS[ticker] = (max(dates) - PERIOD_END_GRACE).month
+    return FISCAL_YEAR_ENDS[ticker]
+
+
+def fiscal_frequency(period_type, year_end_month=12):
+    """Pandas period frequency of a period type for a fiscal year ending in the given month"""
+    return f"{PERIOD_FREQUENCIES[period_type]}-{MONTHS[year_end_month - 1]}"
+
+
+def fiscal_periods(dates, freq):
+    """Fiscal periods (e.g. 2025Q1 of a year ending in September) containing the given period ends"""
+    return (pd.to_datetime(dates) - PERIOD_END_GRACE).to_period(freq)
+
+
+def fiscal_labels(dates, freq):
+    """Header labels of period-end dates: "FY 2024" for years, "Q1 FY 2025" for quarters"""
+    periods = fiscal_periods(dates, freq)
+    if freq.startswith('Q'):
+        return [f"Q{period.quarter} FY {period.qyear}" for period in periods]
+
+    return [f"FY {period.year}" for period in periods]
+
+
+def align_statements(frames, freq='Q-DEC'):
+    """Reindex statements of one period type to a shared period index (newest first)
+
+    ``frames`` maps section -> DataFrame (fields x period-end dates). Columns
+    whose dates fall in the same fiscal period are matched even when the dates differ,
+    periods holding no data in any statement are dropped, and each period is
+    labelled with the latest period-end date seen for it.
+
+    Returns (aligned frames, empty) where ``empty`` is a period x section frame
+    that is True where a statement has no data for a kept period.
+    """
+    keyed = {}
+    period_ends = {}
+
+    for section, frame in frames.items():
+        if frame is None or frame.empty:
+            continue
+
+        dates = pd.to_datetime(frame.columns)
+        periods = fiscal_periods(dates, freq)
+
+        values = frame.apply(pd.to_numeric, errors='coerce')
+        values.columns = periods
+        # A period reported twice keeps its newest column
+        keyed[section] = values.loc[:, ~values.columns.duplicated()]
+
+        for period, date in zip(periods, dates):
+            period_ends[period] = max(period_ends.get(period, date), date)
+
+    if not keyed:
+        return frames, None
+
+    periods = sorted(period_ends, reverse=True)
+    empty = pd.DataFrame({section: values.reindex(columns=periods).isna().all() for section, values in keyed.items()})
+
+    # Periods without any data are dropped; partially empty ones are kept and flagged
+    empty = empty[~empty.all(axis=1)]
+    columns = pd.DatetimeIndex([period_ends[period] for period in empty.index])
+
+    aligned = dict(frames)
+    for section, values in keyed.items():
+        aligned[section] = values.reindex(columns=empty.index)
+        aligned[section].columns = columns
+
+    empty.index = columns
+    return aligned, empty
+
+
+def log_empty_periods(ticker, period_type, empty):
+    """Warn about kept periods that some statements do not cover"""
+    if empty is None:
+        return
+
+    for period_end, sections in empty.iterrows():
+        missing = [section for section, is_empty in sections.items() if is_empty]
+        if missing:
+            logger.warning(f"{ticker} {period_type} period {period_end:%m/%d/%Y} has no {', '.join(missing)} data")
@@ -0,0 +1,208 @@
+"""
+Profiling mode for the report CLI
+Runs a job under cProfile, tracemalloc and a stack sampler and writes hot-function, method and flamegraph reports
+"""
+
+import cProfile
+import functools
+import io
+import logging
+import os
+import pstats
+import sys
+import threading
+import time
+import tracemalloc
+from collections import Counter
+from datetime import datetime
+
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+# Seconds between two stack samples of the collapsed-stack (flamegraph) output
+SAMPLE_INTERVAL = 0.005
+
+# Functions listed in the hot-function report
+HOT_FUNCTIONS = 40
+
+# cProfile only profiles the thread that enabled it before Python 3.12
+_PER_THREAD_PROFILES = sys.version_info < (3, 12)
+
+
+class StackSampler:
+    """Samples the stacks of every thread of this process into collapsed-stack counts"""
+
+    def __init__(self, interval=SAMPLE_INTERVAL):
+        self.interval = interval
+        self.counts = Counter()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="stack-sampler", daemon=True)
+
+    def start(self):
+        self._thread.start()
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+    def _run(self):
+        names = {}
+        while not self._stop.wait(self.interval):
+            for thread in threading.enumerate():
+                names[thread.ident] = thread.name
+
+            for ident, frame in sys._current_frames().items():
+                if ident == self._thread.ident:
+                    continue
+
+                stack = []
+                while frame is not None:
+                    code = frame.f_code
+                    # Method wrappers of MethodStats are left out of the stacks
+                    if not (code.co_name == 'timed' and code.co_filename == __file__):
+                        stack.append(f"{os.path.basename(code.co_filename)}:{code.co_name}")
+                    frame = frame.f_back
+
+                # Root first, one line per distinct stack: "thread;module:function;... count"
+                self.counts[";".join([names.get(ident, str(ident))] + stack[::-1])] += 1
+
+    def write(self, path):
+        with open(path, 'w') as f:
+            for stack, count in self.counts.most_common():
+                f.write(f"{stack} {count}\n")
+
+
+class ThreadProfiles:
+    """One cProfile profiler per thread started while installed (fetch threads, ...)
+
+    Before Python 3.12 a profiler only sees the thread that enabled it; later
+    versions profile every thread from one profiler and need none of these.
+    """
+
+    def __init__(self):
+        self.profilers = []
+        self._lock = threading.Lock()
+
+    def install(self):
+        threading.setprofile(self._start)
+
+    def uninstall(self):
+        threading.setprofile(None)
+
+    def _start(self, frame, event, arg):
+        # Called on the first event of a new thread; enabling replaces this hook in that thread
+        profiler = cProfile.Profile()
+        with self._lock:
+            self.profilers.append(profiler)
+        profiler.enable()
+
+
+class MethodStats:
+    """Wraps functions to attribute wall time and memory growth to each of them
+
+    ``targets`` are (owner, name) pairs of a class and one of its methods, or of a module
+    and a function as that module calls it (the name it was imported under).
+    """
+
+    def __init__(self, targets):
+        self.targets = list(targets)
+        self.originals = {}
+        self.stats = {}
+        self._lock = threading.Lock()
+
+    def install(self):
+        for owner, name in self.targets:
+            function = getattr(owner, name)
+            self.originals[(owner, name)] = function
+            setattr(owner, name, self._wrap(function.__qualname__, function))
+
+    def uninstall(self):
+        for (owner, name), function in self.originals.items():
+            setattr(owner, name, function)
+
+    def _wrap(self, name, method):
+        @functools.wraps(method)
+        def timed(*args, **kwargs):
+            memory = tracemalloc.get_traced_memory()[0]
+            started = time.perf_counter()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = time.perf_counter() - started
+                grown = tracemalloc.get_traced_memory()[0] - memory
+                with self._lock:
+                    calls, total, allocated = self.stats.get(name, (0, 0.0, 0))
+                    self.stats[name] = (calls + 1, total + elapsed, allocated + grown)
+
+        return timed
+
+    def frame(self):
+        """Per-function calls, inclusive wall time and net memory growth, slowest first"""
+        frame = pd.DataFrame.from_dict(self.stats, orient='index', columns=['Calls', 'Seconds', 'Memory Growth (KiB)'])
+        frame.index.name = 'Function'
+        frame['Memory Growth (KiB)'] = frame['Memory Growth (KiB)'] / 1024
+        frame['Seconds Per Call'] = frame['Seconds'] / frame['Calls']
+        return frame.sort_values('Seconds', ascending=False)
+
+
+def profile_call(job, output_dir, targets=()):
+    """Run ``job()`` under cProfile, tracemalloc and the stack sampler and write the reports
+
+    Writes ``profile_<timestamp>.prof`` (pstats dump), ``_hot.txt`` (hottest functions
+    and allocation sites), ``.collapsed`` (flamegraph.pl / speedscope input) and, with
+    ``targets`` (see ``MethodStats``), ``_methods.csv`` attributing time and memory to each
+    of them. Threads started by the job are profiled too; threads already running when it
+    starts are only sampled, and render worker processes are not profiled (run them with
+    one worker to compare).
+    """
+    os.makedirs(output_dir, exist_ok=True)
+    prefix = os.path.join(output_dir, f"profile_{datetime.now().strftime('%Y%m%d_%H%M%S')}")
+
+    methods = MethodStats(targets) if targets else None
+    sampler = StackSampler()
+    profiler = cProfile.Profile()
+    threads = ThreadProfiles() if _PER_THREAD_PROFILES else None
+
+    # One frame per allocation keeps tracemalloc's overhead low; sites are reported by line
+    tracemalloc.start(1)
+    if methods is not None:
+        methods.install()
+    sampler.start()
+    if threads is not None:
+        threads.install()
+    profiler.enable()
+    try:
+        return job()
+    finally:
+        profiler.disable()
+        if threads is not None:
+            threads.uninstall()
+        sampler.stop()
+        if methods is not None:
+            methods.uninstall()
+        snapshot = tracemalloc.take_snapshot()
+        current, peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+        report = io.StringIO()
+        stats = pstats.Stats(profiler, *(threads.profilers if threads is not None else ()), stream=report)
+        stats.dump_stats(f"{prefix}.prof")
+        sampler.write(f"{prefix}.collapsed")
+
+        report.write(f"Traced memory: {current / 2**20:.1f} MiB at exit, {peak / 2**20:.1f} MiB peak\n\n")
+        stats.strip_dirs()
+        for sort in ('cumulative', 'tottime'):
+            stats.sort_stats(sort).print_stats(HOT_FUNCTIONS)
+
+        report.write("Largest allocation sites still held at exit:\n")
+        for stat in snapshot.statistics('lineno')[:20]:
+            report.write(f"{stat}\n")
+
+        with open(f"{prefix}_hot.txt", 'w') as f:
+            f.write(report.getvalue())
+
+        if methods is not None and methods.stats:
+            methods.frame().to_csv(f"{prefix}_methods.csv")
+
+        logger.info(f"Profile saved to {prefix}_hot.txt, {prefix}.collapsed and {prefix}.prof")
@@ -0,0 +1,251 @@
+"""
+Reader for generated financial report workbooks
+Streams timestamped reports in read-only mode and extracts line items for trend backfill
+"""
+
+import openpyxl
+import pandas as pd
+from datetime import datetime
+from concurrent.futures import ProcessPoolExecutor
+import logging
+import glob
+import os
+import re
+from financial_metrics import PRESENT, ZERO, STATE_LABELS, STATE_NAMES
+
+logger = logging.getLogger(__name__)
+
+# Section titles written in column A of the report
+SECTION_TITLES = {
+    "Balance Sheet Data:": "balance_sheet",
+    "Income Statement:": "income",
+    "Cash Flows:": "cashflow",
+    "Per Share Data:": "per_share",
+    "Cash Analytics:": "cash",
+    "Working Capital Cycle:": "working_capital",
+    "Leverage and Coverage:": "credit",
+}
+
+# Column A titles of sections that hold no statement line items
+END_TITLES = {"Peer Comparison:"}
+
+# Zero-based value columns of each period column set (E/G/I, K/M/O, Q/S/U)
+PERIOD_COLUMNS = {
+    "quarterly": (4, 6, 8),
+    "annual": (10, 12, 14),
+    "ttm": (16, 18, 20),
+}
+
+# Rows holding ratios, margins or per-share values rather than amounts in report units
+UNSCALED_ITEMS = {
+    "Current Ratio", "Quick Ratio", "Debt to Equity Ratio",
+    "Gross_Profit_Margin", "EBIT_Margin", "Net Income Margin",
+    "Book Value Per Share", "Tangible Book Value Per Share", "EPS", "FCF Per Share",
+    "FCF Margin", "Cash Conversion", "Capex Intensity", "Cash Runway (Months)",
+    "DSO (Days)", "DIO (Days)", "DPO (Days)", "Cash Conversion Cycle (Days)",
+    "Interest Coverage", "Debt / EBITDA", "Net Debt / EBITDA", "Total Debt / Capital",
+}
+
+# Report labels that differ from the yfinance field they were filled from
+FIELD_NAMES = {
+    "Cash and Equivalents": "Cash And Cash Equivalents",
+    "Short-Term Investments": "Other Short Term Investments",
+    "Inventories": "Inventory",
+    "Short-Term Debt": "Short Term Debt",
+    "Long-Term Debt": "Long Term Debt",
+    "Total Liabilities": "Total Liabilities Net Minority Interest",
+    "Cost of Revenue": "Cost Of Revenue",
+    "Gross_Profit_Margin": "Gross Profit Margin",
+    "EBIT_Margin": "EBIT Margin",
+    "Tax": "Tax Provision",
+    "Account Receivables": "Changes In Account Receivables",
+    "Net Cash Flow-Operating": "Operating Cash Flow",
+    "Capital Expenditures": "Capital Expenditure",
+    "Investments": "Net Investment Purchase And Sale",
+    "Other Investing Activities": "Net Other Investing Changes",
+    "Net Cash Flows-Investing": "Investing Cash Flow",
+    "Net Borrowings": "Net Long Term Debt Issuance",
+    "Net Cash Flows-Financing": "Financing Cash Flow",
+}
+
+# Cell text written in place of values without a number, e.g. "n/a" -> "missing"
+STATE_TEXT = {label: STATE_NAMES[state] for state, label in STATE_LABELS.items()}
+
+REPORT_NAME = re.compile(r"^(?P<ticker>.+)_financial_report_(?P<timestamp>\d{8}_\d{6})\.xlsx$")
+
+
+def _parse_date(value):
+    if isinstance(value, datetime):
+        return value
+    try:
+        return datetime.strptime(str(value), '%m/%d/%Y')
+    except ValueError:
+        return None
+
+
+def _parse_value(value, scale):
+    """Convert a report cell to a raw amount"""
+    if value is None or value == "":
+        return None
+
+    if isinstance(value, str):
+        # Older reports hold pre-formatted strings of raw amounts, e.g. "$(1,234)"
+        text = value.strip()
+        if text.startswith("="):
+            return None
+
+        negative = "(" in text or text.startswith("-")
+        try:
+            number = float(re.sub(r"[$,()\-\s]", "", text))
+        except ValueError:
+            return None
+        return -number if negative else number
+
+    return float(value) * scale
+
+
+def read_report(path):
+    """Extract every line item of one generated report as a list of records
+
+    Each record is (ticker, generated_at, section, item, period_type, period_end,
+    fiscal_period, value, state) with fiscal_period the header label above the date
+    (e.g. "Q1 FY 2025"), values as raw amounts and state one of present, zero,
+    missing or undefined;
+    both numeric reports and older reports holding pre-formatted currency strings
+    are understood.
+    """
+    match = REPORT_NAME.match(os.path.basename(path))
+    ticker = match.group('ticker') if match else None
+    generated_at = datetime.strptime(match.group('timestamp'), '%Y%m%d_%H%M%S') if match else None
+
+    records = []
+    section = None
+    divisor = 1
+    period_ends = {}
+    period_labels = {}
+    previous = ()
+
+    wb = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        ws = wb.worksheets[0]
+
+        for values in ws.iter_rows(values_only=True):
+            values = tuple(values) + (None,) * (21 - len(values))
+            title = values[0]
+
+            if title in END_TITLES:
+                break
+            if title in SECTION_TITLES:
+                section = SECTION_TITLES[title]
+                divisor = 1
+                period_ends = {}
+                previous = values
+                continue
+            if section is None:
+                continue
+
+            # Unit divisor ("In Thousands" | 1000) and period date headers
+            if values[1] == "In Thousands":
+                divisor = values[2] or 1
+            if not period_ends and _parse_date(values[4]):
+                period_ends = {col: _parse_date(values[col]) for cols in PERIOD_COLUMNS.values() for col in cols}
+                # Fiscal period labels sit in the row above the dates
+                period_labels = {col: previous[col] for col in period_ends}
+                continue
+            previous = values
+
+            label = values[2] or values[1]
+            if not label or not period_ends or label == "In Thousands":
+                continue
+
+            # Line items are keyed by yfinance field name, as in the fetched statements
+            item = FIELD_NAMES.get(label, label)
+            scale = 1 if label in UNSCALED_ITEMS else divisor
+            for period_type, cols in PERIOD_COLUMNS.items():
+                for col in cols:
+                    if period_ends.get(col) is None:
+                        continue
+
+                    if values[col] in STATE_TEXT:
+                        amount, state = None, STATE_TEXT[values[col]]
+                    else:
+                        amount = _parse_value(values[col], scale)
+                        if amount is None:
+                            continue
+                        state = STATE_NAMES[ZERO] if amount == 0 else STATE_NAMES[PRESENT]
+
+                    records.append((ticker, generated_at, section, item, period_type, period_ends[col],
+                                    period_labels.get(col), amount, state))
+
+    finally:
+        wb.close()
+
+    return records
+
+
+def read_report_directory(directory, workers=None, pattern="*_financial_report_*.xlsx"):
+    """Read every generated report in a directory in parallel into one long frame"""
+    paths = [
+        path for path in sorted(glob.glob(os.path.join(directory, pattern)))
+        # Excel lock files (~$name.xlsx) are not workbooks
+        if not os.path.basename(path).startswith("~$")
+    ]
+    logger.info(f"Reading {len(paths)} reports from {directory}...")
+
+    records = []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        for path, report_records in zip(paths, pool.map(_read_report_safely, paths, chunksize=16)):
+            records.extend(report_records)
+
+    columns = ['ticker', 'generated_at', 'section', 'item', 'period_type', 'period_end', 'fiscal_period',
+               'value', 'state']
+    history = pd.DataFrame.from_records(records, columns=columns)
+
+    # An item written twice in a report (e.g. the fetched and the derived "Net Cash Flow") keeps
+    # the row with a value over one showing "n/a"
+    history = history.loc[history['value'].isna().sort_values(kind='stable').index]
+    history = history.drop_duplicates(['ticker', 'generated_at', 'section', 'item', 'period_type', 'period_end'])
+    return history.sort_index()
+
+
+def _read_report_safely(path):
+    try:
+        return read_report(path)
+    except Exception as e:
+        logger.warning(f"Error reading report {path}: {e}")
+        return []
+
+
+def to_statement_frame(history, ticker, section, period_type="quarterly"):
+    """Pivot report history into a yfinance-style frame (items x period ends, newest first)
+
+    When several reports cover the same period the most recently generated value wins;
+    missing and undefined values are NaN.
+    """
+    subset = history[(history['ticker'] == ticker) & (history['section'] == section) &
+                     (history['period_type'] == period_type)]
+    latest = subset.sort_values('generated_at').drop_duplicates(['item', 'period_end'], keep='last')
+
+    frame = latest.pivot(index='item', columns='period_end', values='value')
+    return frame.sort_index(axis=1, ascending=False)
+
+
+def main():
+    """Backfill line-item history from a directory of generated reports"""
+    import argparse
+
+    parser = argparse.ArgumentParser(description='Extract line items from generated financial reports')
+    parser.add_argument('directory', nargs='?', default='./reports', help='Directory of generated reports')
+    parser.add_argument('--output', default='report_history.csv', help='CSV file for the extracted history')
+    parser.add_argument('--workers', type=int, default=None, help='Reader processes (default: CPU count)')
+
+    args, unknown = parser.parse_known_args()
+
+    history = read_report_directory(args.directory, args.workers)
+    history.to_csv(args.output, index=False)
+    logger.info(f"Wrote {len(history)} line-item values to {args.output}")
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+    main()
@@ -0,0 +1,267 @@
+"""
+Row-plan rendering backend for the report generator
+Records worksheet writes as compact arrays so workbooks can be rendered in worker processes
+"""
+
+import openpyxl
+from openpyxl.styles import Font, Alignment, NamedStyle
+from openpyxl.cell.cell import MergedCell
+from concurrent.futures import ProcessPoolExecutor
+from array import array
+import functools
+import multiprocessing
+import os
+from io import BytesIO
+import logging
+import tracing
+from fx_rates import currency_number_format
+
+logger = logging.getLogger(__name__)
+
+# Named styles shared by every report cell, keyed by style name
+REPORT_STYLES = {
+    'title': {'font': {'bold': True, 'size': 16}, 'alignment': 'center'},
+    'header': {'font': {'bold': True, 'size': 14}},
+    'subheader': {'font': {'bold': True, 'size': 12}},
+    'label': {'font': {'bold': True}},
+    'currency': {'number_format': '_($* #,##0_);_($* (#,##0);_($* "-"??_);_(@_)'},
+    'percent': {'number_format': '0.00%'},
+    'percent_large': {'number_format': '0.0'},
+    'margin': {'number_format': '0.0%'},
+    'ratio': {'number_format': '0.00'},
+    'percentile': {'number_format': '0%'},
+    'per_share': {'number_format': '#,##0.00'},
+    'days': {'number_format': '0.0'},
+    'state': {'alignment': 'right'},
+}
+
+# Template workbook bytes, read once per process and keyed by path
+_TEMPLATE_CACHE = {}
+
+# Render workers start from a fork server where the platform has one rather than being forked from
+# a parent whose fetch threads may hold locks (logging, tracing, ...) at that moment
+_START_METHOD = 'forkserver' if 'forkserver' in multiprocessing.get_all_start_methods() else None
+
+# Columns of the report layout (A-U); template cells in them hold only the template's look
+_REPORT_COLUMNS = 21
+
+
+def style_number_format(name, currency="USD"):
+    """Number format of a named report style, amounts in the reporting currency"""
+    if name == 'currency':
+        return currency_number_format(currency)
+    return REPORT_STYLES.get(name, {}).get('number_format', 'General')
+
+
+def register_report_styles(wb, currency="USD"):
+    """Add the report's named styles to a workbook so cells can reference them by name"""
+    for name, spec in REPORT_STYLES.items():
+        if name in wb.named_styles:
+            continue
+
+        # Amounts show the symbol of the reporting currency
+        style = NamedStyle(name=name, number_format=style_number_format(name, currency))
+        style.font = Font(**{'name': 'Calibri', 'size': 11, **spec.get('font', {})})
+        if 'alignment' in spec:
+            style.alignment = Alignment(horizontal=spec['alignment'])
+        wb.add_named_style(style)
+
+
+class _PlanCell:
+    """Cell stand-in that records value and named-style assignments"""
+
+    def __init__(self, entry):
+        self._entry = entry
+
+    @property
+    def value(self):
+        return self._entry[0]
+
+    @value.setter
+    def value(self, value):
+        # numpy scalars become plain Python values so plans pickle small
+        self._entry[0] = value.item() if hasattr(value, 'item') else value
+
+    @property
+    def style(self):
+        return self._entry[1]
+
+    @style.setter
+    def style(self, style):
+        self._entry[1] = style
+
+
+class _PlanColumn:
+    """Column dimension stand-in that records the width"""
+
+    def __init__(self):
+        self.width = None
+
+
+class _PlanColumns(dict):
+    def __missing__(self, key):
+        self[key] = _PlanColumn()
+        return self[key]
+
+
+class PlanWorksheet:
+    """Worksheet stand-in that records the report layout into a row plan"""
+
+    def __init__(self):
+        self.cells = {}
+        self.merged_cells = []
+        self.column_dimensions = _PlanColumns()
+
+    def __getitem__(self, coordinate):
+        return _PlanCell(self.cells.setdefault(coordinate, [None, None]))
+
+    def __setitem__(self, coordinate, value):
+        self[coordinate].value = value
+
+    def merge_cells(self, cell_range):
+        self.merged_cells.append(cell_range)
+
+    def to_plan(self):
+        """Serialize the recorded writes as compact parallel arrays"""
+        styles = {}
+        coordinates = []
+        values = []
+        style_ids = array('H')
+
+        for coordinate, (value, style) in self.cells.items():
+            coordinates.append(coordinate)
+            values.append(value)
+            style_ids.append(styles.setdefault(style, len(styles)))
+
+        return {
+            'coordinates': coordinates,
+            'values': values,
+            'style_ids': style_ids,
+            'styles': list(styles),
+            'merged_cells': self.merged_cells,
+            'column_widths': {col: dim.width for col, dim in self.column_dimensions.items()},
+        }
+
+
+def load_template(template_path):
+    """Open a template workbook, reading the file only once per process"""
+    # openpyxl workbooks cannot be cloned into a new file, so the raw bytes are
+    # cached and each report parses its own copy from memory
+    if template_path not in _TEMPLATE_CACHE:
+        with open(template_path, 'rb') as f:
+            _TEMPLATE_CACHE[template_path] = f.read()
+
+    return openpyxl.load_workbook(BytesIO(_TEMPLATE_CACHE[template_path]))
+
+
+def render_plan(plan, output_file, template_path=None):
+    """Write a workbook from a row plan (runs inside a worker process)
+
+    With ``template_path`` the plan is filled into a copy of a pre-styled
+    template laid out like the generated report (labels in C, values in E/G/I,
+    K/M/O and Q/S/U, Δ% between them): the template keeps its own fonts, fills,
+    borders, merges and column widths but none of its labels or figures, cells
+    it styles take the plan's number format, and unstyled cells get the plan's
+    named style.
+    """
+    with tracing.span("render", ticker=plan.get('ticker'), cells=len(plan['coordinates'])):
+        wb = _fill_workbook(plan, template_path)
+
+    with tracing.span("save", ticker=plan.get('ticker'), output=output_file):
+        wb.save(output_file)
+    return output_file
+
+
+def _fill_workbook(plan, template_path=None):
+    """Workbook holding the plan's cells, styles, merges and widths (not saved)"""
+    if template_path:
+        wb = load_template(template_path)
+        ws = wb.active
+
+        # Labels and figures left in the template need not sit on the rows the report writes, so
+        # only the plan's values are shown and missing data is not shown stale
+        for template_row in ws.iter_rows(max_col=_REPORT_COLUMNS):
+            for cell in template_row:
+                if not isinstance(cell, MergedCell):
+                    cell.value = None
+    else:
+        wb = openpyxl.Workbook()
+        ws = wb.active
+        ws.title = "Sheet1"
+
+    currency = plan.get('currency', 'USD')
+    register_report_styles(wb, currency)
+    styles = plan['styles']
+
+    for coordinate, value, style_id in zip(plan['coordinates'], plan['values'], plan['style_ids']):
+        cell = ws[coordinate]
+        if isinstance(cell, MergedCell):
+            continue
+
+        cell.value = value
+
+        style = styles[style_id]
+        if not style:
+            continue
+        if template_path and cell.has_style:
+            # The template's look stays, but values are shown the way the report formats them
+            cell.number_format = style_number_format(style, currency)
+        else:
+            cell.style = style
+
+    if not template_path:
+        for cell_range in plan['merged_cells']:
+            ws.merge_cells(cell_range)
+
+        for col, width in plan['column_widths'].items():
+            ws.column_dimensions[col].width = width
+
+    return wb
+
+
+def _traced_render_plan(plan, output_file, template_path, parent):
+    """Render a plan in a worker process, returning its trace events with the output file"""
+    # Events inherited from a forked parent are not this worker's
+    tracing.drain()
+    tracing.enable()
+    with tracing.span("render job", parent=parent, ticker=plan.get('ticker'), worker=os.getpid()):
+        render_plan(plan, output_file, template_path)
+
+    return output_file, tracing.drain()
+
+
+def render_plans(jobs, workers=None, template_path=None, on_rendered=None):
+    """Render (output_file, plan) jobs across a pool of worker processes
+
+    ``jobs`` may be a generator; each plan is submitted as soon as it is
+    produced so planning in the parent overlaps with rendering in workers.
+    ``on_rendered`` is called with each output file as soon as it is saved,
+    on the pool's result thread, even while later jobs are still being produced.
+    """
+    rendered = []
+
+    # Spans of traced workers are shipped back and nested under the caller's span
+    traced = tracing.enabled()
+    parent = tracing.current_span()
+    parent = parent.context() if parent is not None else None
+
+    def finished(future, output_file):
+        try:
+            result = future.result()
+            if traced:
+                result, events = result
+                tracing.add_events(events)
+            rendered.append(result)
+            logger.info(f"Report saved as {output_file}")
+            if on_rendered is not None:
+                on_rendered(output_file)
+        except Exception as e:
+            logger.error(f"Error rendering {output_file}: {e}")
+
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context(_START_METHOD)) as pool:
+        for output_file, plan in jobs:
+            future = (pool.submit(_traced_render_plan, plan, output_file, template_path, parent) if traced
+                      else pool.submit(render_plan, plan, output_file, template_path))
+            future.add_done_callback(functools.partial(finished, output_file=output_file))
+
+    return rendered
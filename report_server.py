@@ -0,0 +1,177 @@
+"""
+Resident report worker
+Keeps imports, the provider session and fetched statements warm in one process and runs jobs sent over a local socket
+"""
+
+import logging
+import os
+import threading
+import time
+from multiprocessing.connection import Client, Listener
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_ADDRESS = ('127.0.0.1', 6381)
+
+# Environment variable holding the secret shared by server and clients; requests are
+# unpickled, so there is no built-in default anyone could connect with
+KEY_VARIABLE = 'REPORT_SERVER_KEY'
+
+# Seconds fetched statements are reused before the provider is asked again
+CACHE_TTL = 3600
+
+
+def server_key():
+    """Authentication key of the report server, from the environment
+
+    Raises RuntimeError when it is not set.
+    """
+    key = os.environ.get(KEY_VARIABLE)
+    if not key:
+        raise RuntimeError(f"Set {KEY_VARIABLE} to a shared secret to run or reach the report server")
+    return key.encode()
+
+
+def parse_address(text):
+    """Split "host:port" into (host, port)"""
+    host, _, port = text.rpartition(':')
+    return host or DEFAULT_ADDRESS[0], int(port)
+
+
+class StatementCache:
+    """Fetched statements per ticker kept in memory for ``ttl`` seconds
+
+    Offers the load/save interface of the batch journal, so batch runs use it
+    the same way to skip fetches.
+    """
+
+    def __init__(self, ttl=CACHE_TTL):
+        self.ttl = ttl
+        self.entries = {}
+        self._lock = threading.Lock()
+
+    def load_statements(self, ticker):
+        with self._lock:
+            entry = self.entries.get(ticker)
+            if entry is None or time.monotonic() - entry[0] > self.ttl:
+                return None
+            return entry[1]
+
+    def save_statements(self, ticker, state):
+        with self._lock:
+            self.entries[ticker] = (time.monotonic(), state)
+
+
+class ReportServer:
+    """Runs report jobs received over a local socket in this (warm) process
+
+    A job is a dict ``{'action': 'report', 'tickers': [...], 'output_dir': ...,
+    'layout': {...}}`` with the layout of ``FinancialReportAutomation.job_layout``;
+    ``make_automation(output_dir, layout)`` builds the automation running it.
+    Automations are kept per (output_dir, layout); those converting with the same
+    FX table into the same currency share a statement cache, since cached
+    statements are already converted.
+    """
+
+    def __init__(self, make_automation, address=DEFAULT_ADDRESS, cache_ttl=CACHE_TTL, workers=None):
+        self.make_automation = make_automation
+        self.address = address
+        self.workers = workers
+        self.cache_ttl = cache_ttl
+        self.caches = {}
+        self.automations = {}
+        self.started_at = time.time()
+        self.jobs_run = 0
+
+        # Jobs run one at a time; each batch already fans out to fetch threads and render processes
+        self._job_lock = threading.Lock()
+        self._stop = threading.Event()
+
+    def serve_forever(self):
+        """Accept connections until a shutdown request arrives"""
+        self.authkey = server_key()
+        if self.address[0] not in ('127.0.0.1', 'localhost', '::1'):
+            logger.warning(f"Report server reachable from other hosts on {self.address[0]}")
+
+        with Listener(self.address, authkey=self.authkey) as listener:
+            logger.info(f"Report server listening on {self.address[0]}:{self.address[1]} (pid {os.getpid()})")
+
+            while not self._stop.is_set():
+                try:
+                    conn = listener.accept()
+                except Exception as e:
+                    logger.warning(f"Rejected report server connection: {e}")
+                    continue
+
+                if self._stop.is_set():
+                    conn.close()
+                    break
+                threading.Thread(target=self._serve, args=(conn,), daemon=True).start()
+
+        logger.info("Report server stopped")
+
+    def _serve(self, conn):
+        with conn:
+            try:
+                request = conn.recv()
+                conn.send({'ok': True, 'result': self.handle(request)})
+            except Exception as e:
+                logger.error(f"Report server job failed: {e}")
+                conn.send({'ok': False, 'error': str(e)})
+
+    def handle(self, request):
+        """Run one request: report, ping or shutdown"""
+        action = request.get('action')
+
+        if action == 'ping':
+            return {'pid': os.getpid(), 'uptime': time.time() - self.started_at, 'jobs': self.jobs_run,
+                    'cached_tickers': sum(len(cache.entries) for cache in self.caches.values())}
+
+        if action == 'shutdown':
+            self._stop.set()
+            # Wake the accept() call once this reply is sent, so the listener loop sees the stop flag
+            threading.Timer(0.1, lambda: Client(self.address, authkey=self.authkey).close()).start()
+            return {'pid': os.getpid()}
+
+        if action == 'report':
+            return self.run_job(request)
+
+        raise ValueError(f"Unknown report server action: {action}")
+
+    def run_job(self, job):
+        """Run a report batch of the job's tickers with a warm automation"""
+        layout = job['layout']
+        key = (job['output_dir'], repr(sorted(layout.items())))
+        # Statements are cached after conversion, so only jobs converting alike share them
+        fx_key = (layout.get('fx_rates'), layout.get('currency', "USD") if layout.get('fx_rates') else None)
+
+        with self._job_lock:
+            automation = self.automations.get(key)
+            if automation is None:
+                automation = self.make_automation(job['output_dir'], layout)
+                if fx_key not in self.caches:
+                    self.caches[fx_key] = StatementCache(self.cache_ttl)
+                automation.statement_cache = self.caches[fx_key]
+                self.automations[key] = automation
+
+            started = time.perf_counter()
+            output_files = automation.run_batch(job['tickers'], self.workers)
+            self.jobs_run += 1
+
+        logger.info(f"Job of {len(job['tickers'])} tickers done in {time.perf_counter() - started:.1f}s")
+        return output_files
+
+
+def submit(request, address=DEFAULT_ADDRESS):
+    """Send a request to a running report server and return its result
+
+    Raises ConnectionError when no server is listening and RuntimeError when the job failed
+    or no server key is set.
+    """
+    with Client(address, authkey=server_key()) as conn:
+        conn.send(request)
+        response = conn.recv()
+
+    if not response['ok']:
+        raise RuntimeError(response['error'])
+    return response['result']
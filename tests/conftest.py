@@ -0,0 +1,61 @@
+"""
+Shared fixtures for the report generator tests
+Builds statements in the shape yfinance returns them, so no data provider is called
+"""
+
+import os
+import sys
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BALANCE_SHEET_FIELDS = [
+    'Ordinary Shares Number', 'Share Issued', 'Total Debt', 'Tangible Book Value', 'Cash And Cash Equivalents',
+    'Other Short Term Investments', 'Accounts Receivable', 'Inventory', 'Current Assets', 'Total Assets',
+    'Short Term Debt', 'Accounts Payable', 'Other Current Liabilities', 'Current Liabilities', 'Long Term Debt',
+    'Total Liabilities Net Minority Interest', 'Stockholders Equity', 'Net Debt',
+]
+INCOME_FIELDS = [
+    'Total Revenue', 'Cost Of Revenue', 'Gross Profit', 'Research And Development',
+    'Selling General And Administration', 'EBIT', 'EBITDA', 'Interest Expense', 'Tax Provision', 'Net Income',
+    'Diluted EPS', 'Diluted Average Shares', 'Operating Income',
+]
+CASHFLOW_FIELDS = [
+    'Net Income', 'Depreciation', 'Depreciation And Amortization', 'Changes In Account Receivables',
+    'Change In Inventory', 'Operating Cash Flow', 'Capital Expenditure', 'Net Investment Purchase And Sale',
+    'Investing Cash Flow', 'Net Long Term Debt Issuance', 'Financing Cash Flow', 'Free Cash Flow',
+    'Changes In Cash', 'End Cash Position', 'Beginning Cash Position',
+]
+
+QUARTER_ENDS = ['2025-03-31', '2024-12-31', '2024-09-30', '2024-06-30', '2024-03-31', '2023-12-31']
+YEAR_ENDS = ['2024-12-31', '2023-12-31', '2022-12-31', '2021-12-31']
+
+
+def statement(fields, dates, seed=0):
+    """A yfinance-style statement (fields x period ends, newest first) of random amounts"""
+    rng = np.random.default_rng(seed)
+    frame = pd.DataFrame(rng.uniform(1e9, 5e10, size=(len(fields), len(dates))),
+                         index=fields, columns=pd.to_datetime(dates))
+    if 'Capital Expenditure' in fields:
+        frame.loc['Capital Expenditure'] *= -1
+    return frame
+
+
+@pytest.fixture
+def generator(tmp_path):
+    """Report generator holding fetched (and aligned) statements, with every analytics section"""
+    from Q_A_financial_report_v3 import TeslaFinancialReportGenerator, ANALYTICS_SECTIONS
+
+    output_file = str(tmp_path / "TEST_financial_report_20250401_120000.xlsx")
+    generator = TeslaFinancialReportGenerator("TEST", output_file, sections=list(ANALYTICS_SECTIONS))
+
+    generator.quarterly_balance_sheet = statement(BALANCE_SHEET_FIELDS, QUARTER_ENDS, 1)
+    generator.quarterly_income = statement(INCOME_FIELDS, QUARTER_ENDS, 2)
+    generator.quarterly_cashflow = statement(CASHFLOW_FIELDS, QUARTER_ENDS, 3)
+    generator.annual_balance_sheet = statement(BALANCE_SHEET_FIELDS, YEAR_ENDS, 4)
+    generator.annual_income = statement(INCOME_FIELDS, YEAR_ENDS, 5)
+    generator.annual_cashflow = statement(CASHFLOW_FIELDS, YEAR_ENDS, 6)
+    generator.align_periods()
+    return generator
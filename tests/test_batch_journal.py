@@ -0,0 +1,29 @@
+import pandas as pd
+from batch_journal import BatchJournal, DONE
+
+
+def test_resumed_batch_skips_finished_tickers(tmp_path):
+    journal = BatchJournal(str(tmp_path))
+    journal.record("AAA", DONE, "AAA.xlsx")
+
+    resumed = BatchJournal(str(tmp_path))
+    assert resumed.timestamp == journal.timestamp
+    assert resumed.pending(["AAA", "BBB"]) == ["BBB"]
+
+
+def test_half_written_event_is_ignored(tmp_path):
+    journal = BatchJournal(str(tmp_path))
+    journal.record("AAA", DONE, "AAA.xlsx")
+    with open(journal.events_file, 'a') as f:
+        f.write('{"ticker": "BBB", "sta')
+
+    assert BatchJournal(str(tmp_path)).pending(["AAA", "BBB"]) == ["BBB"]
+
+
+def test_statement_checkpoints(tmp_path):
+    journal = BatchJournal(str(tmp_path))
+    state = {'quarterly_income': pd.DataFrame({"2024-12-31": [1.0]}, index=["Total Revenue"])}
+    journal.save_statements("AAA", state)
+
+    assert BatchJournal(str(tmp_path)).load_statements("AAA")['quarterly_income'].equals(state['quarterly_income'])
+    assert journal.load_statements("BBB") is None
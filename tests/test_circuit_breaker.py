@@ -0,0 +1,81 @@
+import pytest
+import circuit_breaker
+from circuit_breaker import CircuitBreaker, CLOSED, OPEN, HALF_OPEN
+
+
+class Clock:
+    """Stand-in for the time module the breaker reads monotonic time from"""
+
+    def __init__(self):
+        self.now = 100.0
+
+    def monotonic(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(circuit_breaker, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def breaker(clock):
+    return CircuitBreaker(error_threshold=0.5, window=4, min_calls=4, cooldown=30, probes=2)
+
+
+def _trip(breaker):
+    for success in (True, False, True, False):
+        assert breaker.allow()
+        breaker.record(success)
+
+
+def test_opens_once_enough_calls_fail(breaker):
+    for success in (False, False, False):
+        breaker.allow()
+        breaker.record(success)
+    # Too few calls to judge the error rate yet
+    assert breaker.state == CLOSED
+
+    breaker.allow()
+    breaker.record(True)
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.rejected == 1
+
+
+def test_stays_closed_below_the_threshold(breaker):
+    for success in (True, True, True, False, True, True):
+        breaker.allow()
+        breaker.record(success)
+    assert breaker.state == CLOSED
+
+
+def test_half_open_after_cooldown_lets_probes_through(breaker, clock):
+    _trip(breaker)
+    assert breaker.is_open()
+    assert breaker.retry_after() == 30
+
+    clock.now += 30
+    assert breaker.retry_after() == 0
+    assert breaker.allow() and breaker.allow()
+    assert breaker.state == HALF_OPEN
+    # Only the probes pass until they report back
+    assert not breaker.allow()
+
+    breaker.record(True)
+    breaker.record(True)
+    assert breaker.state == CLOSED
+    assert breaker.allow()
+
+
+def test_failed_probe_opens_again(breaker, clock):
+    _trip(breaker)
+    clock.now += 30
+    assert breaker.allow()
+    breaker.record(False)
+
+    assert breaker.state == OPEN
+    assert not breaker.allow()
+    assert breaker.retry_after() == 30
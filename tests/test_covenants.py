@@ -0,0 +1,62 @@
+import json
+import pandas as pd
+import pytest
+from covenants import CovenantMonitor, input_fingerprint
+from financial_metrics import PRESENT
+
+
+@pytest.fixture
+def config(tmp_path):
+    path = tmp_path / "covenants.json"
+    path.write_text(json.dumps({"*": {"Current Ratio": {"min": 1.2}}, "BBB": {"Current Ratio": {"min": 2.0}}}))
+    return str(path)
+
+
+def _statements(current_assets):
+    return {ticker: {'balance_sheet': pd.DataFrame({pd.Timestamp('2024-12-31'): [assets, 100.0]},
+                                                   index=["Current Assets", "Current Liabilities"])}
+            for ticker, assets in current_assets.items()}
+
+
+def _metrics(current_ratios):
+    return {ticker: {'quarterly': (pd.DataFrame({"Current Ratio": [ratio]}, index=[pd.Timestamp('2024-12-31')]),
+                                   pd.DataFrame({"Current Ratio": [PRESENT]}, index=[pd.Timestamp('2024-12-31')]))}
+            for ticker, ratio in current_ratios.items()}
+
+
+def test_fingerprint_follows_the_statements():
+    statements = _statements({"AAA": 150.0})["AAA"]
+    assert input_fingerprint(statements) == input_fingerprint(_statements({"AAA": 150.0})["AAA"])
+    assert input_fingerprint(statements) != input_fingerprint(_statements({"AAA": 151.0})["AAA"])
+
+
+def test_unchanged_tickers_are_skipped(config, tmp_path):
+    monitor = CovenantMonitor(config, str(tmp_path / "state"))
+    statements = _statements({"AAA": 150.0, "BBB": 150.0})
+    changed = monitor.changed(statements)
+    assert set(changed) == {"AAA", "BBB"}
+
+    breaches = monitor.update(_metrics({"AAA": 1.5, "BBB": 1.5}), changed)
+    assert breaches['ticker'].tolist() == ["BBB"]
+    assert breaches['new'].tolist() == [True]
+
+    # A later run (state read back from disk) only re-evaluates the ticker whose statements changed
+    monitor = CovenantMonitor(config, str(tmp_path / "state"))
+    changed = monitor.changed(_statements({"AAA": 110.0, "BBB": 150.0}))
+    assert set(changed) == {"AAA"}
+
+    breaches = monitor.update(_metrics({"AAA": 1.1}), changed)
+    assert sorted(breaches['ticker']) == ["AAA", "BBB"]
+    assert dict(zip(breaches['ticker'], breaches['new'])) == {"AAA": True, "BBB": False}
+    assert "new" not in pd.read_csv(monitor.status_file).columns
+
+
+def test_changed_thresholds_re_evaluate(config, tmp_path):
+    monitor = CovenantMonitor(config, str(tmp_path / "state"))
+    statements = _statements({"AAA": 150.0})
+    monitor.update(_metrics({"AAA": 1.5}), monitor.changed(statements))
+
+    with open(config, 'w') as f:
+        json.dump({"*": {"Current Ratio": {"min": 1.6}}}, f)
+    monitor = CovenantMonitor(config, str(tmp_path / "state"))
+    assert set(monitor.changed(statements)) == {"AAA"}
@@ -0,0 +1,36 @@
+import pandas as pd
+from filing_calendar import FilingScheduler, load_filing_calendar
+
+
+def test_calendar_from_json(tmp_path):
+    path = tmp_path / "filings.json"
+    path.write_text('{"aaa": ["2025-04-22", "2025-01-29"], "BBB": "2025-05-01"}')
+    calendar = load_filing_calendar(str(path))
+
+    assert list(calendar["AAA"]) == list(pd.to_datetime(["2025-01-29", "2025-04-22"]))
+    assert list(calendar["BBB"]) == [pd.Timestamp("2025-05-01")]
+
+
+def test_polled_often_only_inside_the_filing_window(tmp_path):
+    calendar = {"AAA": pd.DatetimeIndex(["2025-04-22"])}
+    scheduler = FilingScheduler(calendar, str(tmp_path / "schedule.json"))
+    scheduler.record(["AAA"], {"AAA": pd.Timestamp("2024-12-31")}, now="2025-04-01")
+
+    # Before the filing the heartbeat applies; inside the window every poll interval
+    assert scheduler.due(["AAA"], now="2025-04-10") == []
+    scheduler.record(["AAA"], {"AAA": pd.Timestamp("2024-12-31")}, now="2025-04-22 08:00")
+    assert scheduler.due(["AAA"], now="2025-04-22 15:00") == ["AAA"]
+
+    # Once the new quarter is in the statements the window closes
+    scheduler.record(["AAA"], {"AAA": pd.Timestamp("2025-03-31")}, now="2025-04-23 08:00")
+    assert scheduler.due(["AAA"], now="2025-04-23 15:00") == []
+
+
+def test_poll_state_survives_restarts(tmp_path):
+    scheduler = FilingScheduler({}, str(tmp_path / "schedule.json"))
+    assert scheduler.due(["AAA"], now="2025-04-01") == ["AAA"]
+    scheduler.record(["AAA"], {"AAA": None}, now="2025-04-01")
+
+    restarted = FilingScheduler({}, str(tmp_path / "schedule.json"))
+    assert restarted.due(["AAA"], now="2025-04-02") == []
+    assert restarted.due(["AAA"], now="2025-04-15") == ["AAA"]
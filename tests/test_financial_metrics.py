@@ -0,0 +1,88 @@
+import numpy as np
+import pandas as pd
+import pytest
+from financial_metrics import (compute_masked_ratios, masked_divide, trailing_twelve_months, PRESENT, ZERO,
+                               MISSING, UNDEFINED)
+
+
+def _raw(**fields):
+    """One observation of raw statement fields"""
+    return pd.DataFrame([fields], index=["TEST"], dtype=float)
+
+
+def test_masked_divide_tells_states_apart():
+    numerators = pd.DataFrame({"ratio": [1.0, 0.0, np.nan, 1.0, np.nan]})
+    denominators = pd.DataFrame({"ratio": [2.0, 2.0, 2.0, 0.0, 0.0]})
+    values, states = masked_divide(numerators, denominators)
+
+    assert states["ratio"].tolist() == [PRESENT, ZERO, MISSING, UNDEFINED, MISSING]
+    assert values["ratio"].iloc[0] == 0.5
+    assert values["ratio"].iloc[1:].fillna(-1).tolist() == [0.0, -1, -1, -1]
+
+
+def test_ratios_of_zero_divisors_are_undefined():
+    values, states = compute_masked_ratios(_raw(**{
+        "Current Assets": 100, "Current Liabilities": 0, "Total Revenue": 0, "Gross Profit": 10,
+    }))
+
+    assert states.at["TEST", "Current Ratio"] == UNDEFINED
+    assert states.at["TEST", "Gross Profit Margin"] == UNDEFINED
+    assert np.isnan(values.at["TEST", "Current Ratio"])
+
+
+def test_ratios_of_missing_inputs_are_missing():
+    values, states = compute_masked_ratios(_raw(**{"Current Assets": 100, "Total Revenue": 50}))
+
+    assert states.at["TEST", "Current Ratio"] == MISSING
+    assert states.at["TEST", "Gross Profit Margin"] == MISSING
+    assert states.at["TEST", "Debt to Equity Ratio"] == MISSING
+
+
+def test_quick_ratio_without_inventory_line():
+    values, states = compute_masked_ratios(_raw(**{
+        "Current Assets": 120, "Current Liabilities": 60, "Total Revenue": 100, "Net Income": 0,
+    }))
+
+    # A balance sheet without inventory holds none; a zero net income is a zero margin, not missing
+    assert values.at["TEST", "Quick Ratio"] == pytest.approx(2.0)
+    assert states.at["TEST", "Quick Ratio"] == PRESENT
+    assert states.at["TEST", "Net Income Margin"] == ZERO
+
+
+def _quarterly(values, dates, field="Total Revenue"):
+    """A one-field quarterly statement (newest column first)"""
+    return pd.DataFrame([values], index=[field], columns=pd.to_datetime(dates), dtype=float)
+
+
+def test_ttm_sums_four_consecutive_quarters():
+    dates = ['2025-03-31', '2024-12-31', '2024-09-30', '2024-06-30', '2024-03-31']
+    ttm = trailing_twelve_months(_quarterly([5, 4, 3, 2, 1], dates))
+
+    assert ttm.loc["Total Revenue"].tolist()[:2] == [14, 10]
+    assert ttm.loc["Total Revenue"].iloc[2:].isna().all()
+    assert list(ttm.columns) == list(pd.to_datetime(dates))
+
+
+def test_ttm_window_with_an_absent_quarter_is_missing():
+    # Q1 2025 is absent, so four columns would span fifteen months
+    dates = ['2025-06-30', '2024-12-31', '2024-09-30', '2024-06-30']
+    ttm = trailing_twelve_months(_quarterly([1, 1, 1, 1], dates))
+
+    assert ttm.loc["Total Revenue"].isna().all()
+
+
+def test_ttm_averages_balances_and_share_counts():
+    dates = ['2024-12-31', '2024-09-30', '2024-06-30', '2024-03-31']
+    balances = trailing_twelve_months(_quarterly([8, 6, 4, 2], dates, "Total Assets"), stock=True)
+    shares = trailing_twelve_months(_quarterly([8, 6, 4, 2], dates, "Diluted Average Shares"))
+
+    assert balances.iloc[0, 0] == 5
+    assert shares.iloc[0, 0] == 5
+
+
+def test_ttm_follows_the_fiscal_quarters():
+    # 52/53-week quarters of a September year end a few days apart from the calendar month ends
+    dates = ['2024-12-28', '2024-09-28', '2024-06-29', '2024-03-30']
+    ttm = trailing_twelve_months(_quarterly([4, 3, 2, 1], dates), freq='Q-SEP')
+
+    assert ttm.iloc[0, 0] == 10
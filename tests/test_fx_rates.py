@@ -0,0 +1,35 @@
+import pandas as pd
+import pytest
+from fx_rates import FxRateTable, currency_number_format
+
+
+@pytest.fixture
+def rates(tmp_path):
+    path = tmp_path / "rates.csv"
+    path.write_text("currency,date,rate\n"
+                    "eur,2024-10-31,1.00\neur,2024-11-30,1.10\neur,2024-12-31,1.20\n")
+    return FxRateTable(str(path))
+
+
+def test_end_and_average_rates(rates):
+    assert rates.rate("EUR", "2024-12-31") == 1.20
+    assert rates.rate("EUR", "2025-01-15") == 1.20
+    assert rates.rate("EUR", "2024-12-31", method='average') == pytest.approx(1.10)
+    assert rates.rate("USD", "2024-12-31") == 1.0
+    assert pd.isna(rates.rate("EUR", "2024-01-31"))
+
+
+def test_statements_convert_amounts_but_not_counts(rates):
+    income = pd.DataFrame({pd.Timestamp("2024-12-31"): [100.0, 10.0]},
+                          index=["Total Revenue", "Diluted Average Shares"])
+    balance_sheet = pd.DataFrame({pd.Timestamp("2024-12-31"): [100.0]}, index=["Total Assets"])
+    converted = rates.convert_statements({'income': income, 'balance_sheet': balance_sheet}, "EUR")
+
+    assert converted['income'].iloc[:, 0].tolist() == pytest.approx([110.0, 10.0])
+    assert converted['balance_sheet'].iloc[0, 0] == pytest.approx(120.0)
+
+
+def test_number_format_shows_the_reporting_currency():
+    assert currency_number_format("USD").startswith("_($*")
+    assert '"€"' in currency_number_format("EUR")
+    assert '"CHF "' in currency_number_format("CHF")
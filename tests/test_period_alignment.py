@@ -0,0 +1,68 @@
+import pandas as pd
+import period_alignment
+from period_alignment import align_statements, fiscal_frequency, fiscal_labels, fiscal_year_end, load_fiscal_calendar
+
+
+def _statement(dates, values=None, field="Total Assets"):
+    values = values if values is not None else range(1, len(dates) + 1)
+    return pd.DataFrame([list(values)], index=[field], columns=pd.to_datetime(dates), dtype=float)
+
+
+def test_dates_of_one_period_are_matched():
+    # The income statement ends a quarter a few days apart from the balance sheet (52/53-week filer)
+    frames = {
+        'balance_sheet': _statement(['2024-12-31', '2024-09-30']),
+        'income': _statement(['2024-12-28', '2024-09-28'], field="Total Revenue"),
+    }
+    aligned, empty = align_statements(frames)
+
+    expected = pd.to_datetime(['2024-12-31', '2024-09-30'])
+    assert list(aligned['balance_sheet'].columns) == list(expected)
+    assert list(aligned['income'].columns) == list(expected)
+    assert aligned['income'].loc["Total Revenue"].tolist() == [1, 2]
+    assert not empty.any().any()
+
+
+def test_week_into_next_month_stays_in_its_period():
+    # A January year of a 52/53-week filer may end on 02/01
+    aligned, _ = align_statements({'balance_sheet': _statement(['2025-02-01', '2024-11-02'])}, freq='Q-JAN')
+    assert aligned['balance_sheet'].shape[1] == 2
+
+    aligned, _ = align_statements({
+        'balance_sheet': _statement(['2025-02-01']),
+        'income': _statement(['2025-01-31'], field="Total Revenue"),
+    }, freq='Q-JAN')
+    assert aligned['balance_sheet'].shape[1] == 1
+
+
+def test_periods_without_data_are_dropped_and_partial_ones_flagged():
+    frames = {
+        'balance_sheet': _statement(['2024-12-31', '2024-09-30', '2024-06-30'], [1, None, 3]),
+        'income': _statement(['2024-12-31', '2024-09-30', '2024-06-30'], [1, None, None], "Total Revenue"),
+    }
+    aligned, empty = align_statements(frames)
+
+    assert list(aligned['balance_sheet'].columns) == list(pd.to_datetime(['2024-12-31', '2024-06-30']))
+    assert empty['income'].tolist() == [False, True]
+    assert empty['balance_sheet'].tolist() == [False, False]
+
+
+def test_fiscal_year_end_of_a_week_into_next_month(monkeypatch):
+    monkeypatch.setattr(period_alignment, 'FISCAL_YEAR_ENDS', {})
+    annual = _statement(['2025-02-01', '2024-02-03', '2023-01-28'])
+    assert fiscal_year_end("TEST", [annual]) == 1
+
+
+def test_fiscal_year_end_from_calendar_table(monkeypatch, tmp_path):
+    monkeypatch.setattr(period_alignment, 'FISCAL_YEAR_ENDS', {})
+    calendar = tmp_path / "fiscal_calendar.json"
+    calendar.write_text('{"aapl": 9}')
+    load_fiscal_calendar(str(calendar))
+
+    assert fiscal_year_end("AAPL", [_statement(['2024-12-31'])]) == 9
+
+
+def test_fiscal_labels():
+    assert fiscal_labels(pd.to_datetime(['2024-12-28', '2024-09-28']), fiscal_frequency('quarterly', 9)) == \
+        ["Q1 FY 2025", "Q4 FY 2024"]
+    assert fiscal_labels(pd.to_datetime(['2025-02-01']), fiscal_frequency('annual', 1)) == ["FY 2025"]
@@ -0,0 +1,57 @@
+import numpy as np
+import pytest
+from report_reader import read_report_directory, to_statement_frame
+
+
+@pytest.fixture
+def history(generator, tmp_path):
+    """Line-item history read back from one report written by the generator"""
+    generator.create_excel_report()
+    return read_report_directory(str(tmp_path), workers=1)
+
+
+def _read_back(history, section, item, period_type="quarterly"):
+    frame = to_statement_frame(history, "TEST", section, period_type)
+    return frame.loc[item].to_numpy(dtype=float)
+
+
+def _metric(generator, metric, period_type="quarterly"):
+    values, _ = generator.period_metrics[period_type]
+    return values[metric].to_numpy(dtype=float)[:3]
+
+
+@pytest.mark.parametrize("period_type", ["quarterly", "annual"])
+def test_statement_items_round_trip(generator, history, period_type):
+    frames = generator.statement_frames(period_type)
+    for section, item in (("balance_sheet", "Cash And Cash Equivalents"), ("balance_sheet", "Total Assets"),
+                          ("income", "Total Revenue"), ("cashflow", "Operating Cash Flow")):
+        expected = frames[section].loc[item].to_numpy(dtype=float)[:3]
+        assert _read_back(history, section, item, period_type) == pytest.approx(expected)
+
+
+def test_derived_net_cash_flow_wins_over_missing_field(generator, history):
+    cashflow = generator.quarterly_cashflow
+    expected = (cashflow.loc["Operating Cash Flow"] + cashflow.loc["Investing Cash Flow"]
+                + cashflow.loc["Financing Cash Flow"]).to_numpy(dtype=float)[:3]
+    assert _read_back(history, "cashflow", "Net Cash Flow") == pytest.approx(expected)
+
+
+@pytest.mark.parametrize("section, metric", [
+    ("cash", "Free Cash Flow"),
+    ("credit", "EBITDA"),
+    ("credit", "Net Debt"),
+])
+def test_analytics_amounts_round_trip(generator, history, section, metric):
+    assert _read_back(history, section, metric) == pytest.approx(_metric(generator, metric))
+
+
+@pytest.mark.parametrize("section, metric", [
+    ("cash", "FCF Margin"),
+    ("credit", "Total Debt / Capital"),
+    ("working_capital", "DSO (Days)"),
+])
+def test_analytics_ratios_round_trip(generator, history, section, metric):
+    expected = _metric(generator, metric)
+    read = _read_back(history, section, metric)
+    assert np.isnan(read).tolist() == np.isnan(expected).tolist()
+    assert read[~np.isnan(read)] == pytest.approx(expected[~np.isnan(expected)])
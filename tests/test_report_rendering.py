@@ -0,0 +1,44 @@
+import os
+import openpyxl
+import pytest
+from report_rendering import render_plan
+
+TEMPLATE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                        "tesla_Quartely_anual_financial_statement.xlsx")
+
+
+@pytest.fixture
+def templated(generator, tmp_path):
+    """Row plan of the generator and the bundled template filled from it"""
+    plan = generator.build_row_plan()
+    output_file = str(tmp_path / "templated.xlsx")
+    render_plan(plan, output_file, TEMPLATE)
+    return plan, openpyxl.load_workbook(output_file).active
+
+
+def test_template_holds_only_plan_cells(templated):
+    plan, ws = templated
+    planned = {coordinate: value for coordinate, value in zip(plan['coordinates'], plan['values'])
+               if value is not None}
+    written = {cell.coordinate: cell.value for row in ws.iter_rows() for cell in row if cell.value is not None}
+
+    assert written.keys() == planned.keys()
+    for coordinate, value in planned.items():
+        assert written[coordinate] == (value if isinstance(value, str) else pytest.approx(value))
+
+
+def test_template_labels_match_plan(templated):
+    plan, ws = templated
+    planned = dict(zip(plan['coordinates'], plan['values']))
+
+    # Labels of the template's own layout (e.g. its "%Margin" rows) do not survive next to report rows
+    for coordinate in ("C50", "C51", "E52", "C60", "C76", "C77", "B78", "B79"):
+        assert ws[coordinate].value == planned.get(coordinate)
+    labels = [cell.value for row in ws.iter_rows() for cell in row if isinstance(cell.value, str)]
+    assert labels.count("Cash Flows-Financing Activities:") == 1
+
+
+def test_template_cells_take_report_number_formats(templated):
+    plan, ws = templated
+    assert isinstance(ws["E8"].value, float)
+    assert ws["E8"].number_format.startswith("_(")
@@ -0,0 +1,97 @@
+import time
+import pytest
+import work_queue
+from work_queue import WorkQueue, READY, LEASED, DONE, DEAD
+
+
+class Clock:
+    """Stand-in for the time module the queue reads the current time from"""
+
+    def __init__(self):
+        self.now = 1_000_000.0
+
+    def time(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(work_queue, 'time', clock)
+    return clock
+
+
+@pytest.fixture
+def queue(tmp_path, clock):
+    queue = WorkQueue(str(tmp_path / "jobs.db"), visibility_timeout=60, max_attempts=2, retry_delay=10)
+    queue.enqueue([("AAA", {'sections': []}, "AAA.xlsx")])
+    return queue
+
+
+def test_leased_job_is_hidden_until_its_lease_expires(queue, clock):
+    job, = queue.lease("worker-1")
+    assert job['layout'] == {'sections': []} and job['attempts'] == 1
+    assert queue.lease("worker-2") == []
+
+    clock.now += 61
+    again, = queue.lease("worker-2")
+    assert again['id'] == job['id'] and again['attempts'] == 2
+
+    # The first worker's lease has passed on, so its late ack is refused
+    assert not queue.ack(job)
+    assert queue.ack(again)
+    assert queue.counts()[DONE] == 1
+
+
+def test_failed_job_is_retried_after_its_delay(queue, clock):
+    job, = queue.lease("worker-1")
+    queue.fail(job, "provider error")
+    assert queue.counts()[READY] == 1
+    assert queue.lease("worker-1") == []
+
+    clock.now += 10
+    retried, = queue.lease("worker-1")
+    assert retried['attempts'] == 2
+
+
+def test_job_out_of_attempts_is_dead_lettered(queue, clock):
+    for _ in range(2):
+        job, = queue.lease("worker-1")
+        queue.fail(job, "provider error")
+        clock.now += 20
+
+    assert queue.counts()[DEAD] == 1
+    assert queue.dead_letters()[0]['last_error'] == "provider error"
+
+
+def test_lease_expiring_on_its_last_attempt_is_dead_lettered(queue, clock):
+    for _ in range(2):
+        queue.lease("worker-1")
+        clock.now += 61
+
+    assert queue.lease("worker-2") == []
+    dead, = queue.dead_letters()
+    assert dead['last_error'] == "visibility timeout"
+
+
+def test_released_job_keeps_its_attempts(queue, clock):
+    job, = queue.lease("worker-1")
+    queue.release(job, delay=30)
+    assert queue.lease("worker-1") == []
+
+    clock.now += 30
+    again, = queue.lease("worker-1")
+    assert again['attempts'] == 1
+
+
+def test_heartbeat_keeps_a_running_job_leased(tmp_path):
+    queue = WorkQueue(str(tmp_path / "jobs.db"), visibility_timeout=0.5)
+    queue.enqueue([("AAA", {}, "AAA.xlsx")])
+
+    job, = queue.lease("worker-1")
+    with queue.heartbeat([job], "worker-1", interval=0.1):
+        time.sleep(1.0)
+        assert queue.lease("worker-2") == []
+
+    assert queue.ack(job)
+    assert queue.counts()[LEASED] == 0
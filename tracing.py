@@ -0,0 +1,143 @@
+"""
+Span tracing of report generation
+Records nested timed spans (batch, fetch, align, compute, render, save) and exports them as a Chrome/Perfetto trace file
+"""
+
+import contextvars
+import itertools
+import json
+import logging
+import os
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Trace events of finished spans, from this process and its render workers (None while disabled)
+_events = None
+_lock = threading.Lock()
+
+# Innermost open span of the running thread
+_current = contextvars.ContextVar('current_span', default=None)
+
+_span_ids = itertools.count(1)
+
+
+def _reset_after_fork():
+    """Give a forked child its own lock, which a parent thread may have held at the fork"""
+    global _lock
+    _lock = threading.Lock()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_reset_after_fork)
+
+
+class Span:
+    """One timed operation with a parent span and free-form attributes"""
+
+    def __init__(self, name, parent=None, **attributes):
+        self.name = name
+        # Span ids stay unique across render worker processes
+        self.span_id = f"{os.getpid():x}.{next(_span_ids):x}"
+        if isinstance(parent, Span):
+            parent = parent.context()
+        self.parent_id, self.trace_id = parent if parent is not None else (None, uuid.uuid4().hex)
+        self.attributes = attributes
+        self.pid = os.getpid()
+        self.tid = threading.get_native_id()
+        self.start = time.time()
+        self.end = None
+
+    def context(self):
+        """(span id, trace id) of the span, to parent spans recorded in another process"""
+        return self.span_id, self.trace_id
+
+    def set(self, **attributes):
+        """Add attributes to the span, e.g. outcomes only known at its end"""
+        self.attributes.update(attributes)
+
+    def to_event(self):
+        """Complete ("X") event of the Chrome trace event format, times in microseconds"""
+        return {
+            'name': self.name,
+            'cat': self.attributes.get('ticker', 'report'),
+            'ph': 'X',
+            'ts': self.start * 1e6,
+            'dur': (self.end - self.start) * 1e6,
+            'pid': self.pid,
+            'tid': self.tid,
+            'args': dict(self.attributes, span_id=self.span_id, parent_id=self.parent_id, trace_id=self.trace_id),
+        }
+
+
+def enable():
+    """Start recording spans in this process"""
+    global _events
+    with _lock:
+        if _events is None:
+            _events = []
+
+
+def enabled():
+    return _events is not None
+
+
+@contextmanager
+def span(name, parent=None, **attributes):
+    """Time the enclosed block as a span, nested in ``parent`` or the current span
+
+    Threads do not inherit the current span, so work handed to a pool passes
+    its parent (a Span or, across processes, its ``context()``) explicitly. Yields None
+    while tracing is disabled.
+    """
+    if _events is None:
+        yield None
+        return
+
+    current = Span(name, parent if parent is not None else _current.get(), **attributes)
+    token = _current.set(current)
+    try:
+        yield current
+    except Exception as e:
+        current.set(error=str(e))
+        raise
+    finally:
+        current.end = time.time()
+        _current.reset(token)
+        with _lock:
+            _events.append(current.to_event())
+
+
+def current_span():
+    """Innermost open span of the running thread, or None"""
+    return _current.get()
+
+
+def drain():
+    """Remove and return the recorded trace events, e.g. to ship them from a worker process"""
+    global _events
+    with _lock:
+        events, _events = (_events or []), ([] if _events is not None else None)
+    return events
+
+
+def add_events(events):
+    """Merge trace events recorded in another process"""
+    with _lock:
+        if _events is not None:
+            _events.extend(events)
+
+
+def export(path):
+    """Write every span recorded so far to a Chrome trace JSON file (chrome://tracing, Perfetto)"""
+    with _lock:
+        events = sorted(_events or [], key=lambda event: event['ts'])
+
+    with open(path, 'w') as f:
+        json.dump({'traceEvents': events, 'displayTimeUnit': 'ms'}, f)
+
+    logger.info(f"Trace of {len(events)} spans saved to {path}")
+    return path
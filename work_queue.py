@@ -0,0 +1,192 @@
+"""
+SQLite-backed work queue for report jobs
+Producers enqueue (ticker, layout, output) jobs; workers on any node sharing the file lease, run and ack them
+"""
+
+import sqlite3
+import logging
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+logger = logging.getLogger(__name__)
+
+# Job states: ready to lease, leased by a worker, finished, or given up on (dead letter)
+READY = 'ready'
+LEASED = 'leased'
+DONE = 'done'
+DEAD = 'dead'
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    ticker TEXT NOT NULL,
+    layout TEXT NOT NULL,
+    output TEXT NOT NULL,
+    status TEXT NOT NULL DEFAULT 'ready',
+    attempts INTEGER NOT NULL DEFAULT 0,
+    visible_at REAL NOT NULL,
+    lease_owner TEXT,
+    last_error TEXT,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_visible ON jobs (status, visible_at);
+"""
+
+
+class WorkQueue:
+    """Job queue in one SQLite file, shared by producers and workers through file locks
+
+    A leased job is invisible to other workers for ``visibility_timeout`` seconds,
+    extended while its worker heartbeats; if it is not acked by then (the worker
+    crashed or hung) it is leased again.
+    Failed jobs are retried after ``retry_delay`` seconds times their attempt count
+    and dead-lettered after ``max_attempts`` attempts.
+    """
+
+    def __init__(self, path, visibility_timeout=900, max_attempts=3, retry_delay=60):
+        self.path = path
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_delay = retry_delay
+
+        conn = sqlite3.connect(self.path, timeout=60)
+        try:
+            conn.executescript(SCHEMA)
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        """Short-lived connection holding the database write lock for one operation"""
+        # A connection per operation, so threads and processes never share one
+        conn = sqlite3.connect(self.path, timeout=60, isolation_level=None)
+        conn.row_factory = sqlite3.Row
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            yield conn
+            conn.execute("COMMIT")
+        except Exception:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            conn.close()
+
+    def enqueue(self, jobs):
+        """Add (ticker, layout dict, output file) jobs; returns the number enqueued"""
+        now = time.time()
+        rows = [(ticker, json.dumps(layout, sort_keys=True), output, now, now, now) for ticker, layout, output in jobs]
+
+        with self._transaction() as conn:
+            conn.executemany("INSERT INTO jobs (ticker, layout, output, visible_at, created_at, updated_at) "
+                             "VALUES (?, ?, ?, ?, ?, ?)", rows)
+
+        logger.info(f"Enqueued {len(rows)} report jobs in {self.path}")
+        return len(rows)
+
+    def lease(self, worker_id, limit=1):
+        """Lease up to ``limit`` visible jobs to a worker; returns them as dicts"""
+        now = time.time()
+        # The write lock is taken before selecting, so no two workers lease the same job
+        with self._transaction() as conn:
+            # Leases that expired on their last attempt go to the dead letters
+            conn.execute("UPDATE jobs SET status = ?, last_error = COALESCE(last_error, 'visibility timeout'), "
+                         "updated_at = ? WHERE status = ? AND visible_at <= ? AND attempts >= ?",
+                         (DEAD, now, LEASED, now, self.max_attempts))
+
+            rows = conn.execute("SELECT * FROM jobs WHERE status IN (?, ?) AND visible_at <= ? ORDER BY id LIMIT ?",
+                                (READY, LEASED, now, limit)).fetchall()
+            conn.executemany("UPDATE jobs SET status = ?, attempts = attempts + 1, visible_at = ?, lease_owner = ?, "
+                             "updated_at = ? WHERE id = ?",
+                             [(LEASED, now + self.visibility_timeout, worker_id, now, row['id']) for row in rows])
+
+        return [dict(row, layout=json.loads(row['layout']), attempts=row['attempts'] + 1, lease_owner=worker_id)
+                for row in rows]
+
+    def extend(self, job_ids, worker_id):
+        """Push back the visibility timeout of jobs a worker is still running"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.executemany("UPDATE jobs SET visible_at = ?, updated_at = ? WHERE id = ? AND lease_owner = ? "
+                             "AND status = ?",
+                             [(now + self.visibility_timeout, now, job_id, worker_id, LEASED) for job_id in job_ids])
+
+    @contextmanager
+    def heartbeat(self, jobs, worker_id, interval=None):
+        """Keep extending the leases of jobs while the enclosed block runs them
+
+        Leases are extended every ``interval`` seconds, a third of the visibility timeout by default.
+        """
+        interval = interval or self.visibility_timeout / 3
+        job_ids = [job['id'] for job in jobs]
+        stop = threading.Event()
+
+        def beat():
+            while not stop.wait(interval):
+                try:
+                    self.extend(job_ids, worker_id)
+                except Exception as e:
+                    logger.warning(f"Could not extend the leases of {len(job_ids)} jobs: {e}")
+
+        thread = threading.Thread(target=beat, name="lease-heartbeat", daemon=True)
+        thread.start()
+        try:
+            yield
+        finally:
+            stop.set()
+            thread.join()
+
+    def ack(self, job):
+        """Mark a leased job finished; returns False when its lease has passed to another worker"""
+        with self._transaction() as conn:
+            acked = conn.execute("UPDATE jobs SET status = ?, lease_owner = NULL, updated_at = ? "
+                                 "WHERE id = ? AND lease_owner = ? AND status = ?",
+                                 (DONE, time.time(), job['id'], job['lease_owner'], LEASED)).rowcount
+
+        if not acked:
+            logger.warning(f"Job {job['id']} ({job['ticker']}) was leased again before its ack")
+        return bool(acked)
+
+    def fail(self, job, error, retry=True):
+        """Release a failed job for a later retry, or dead-letter it when out of attempts
+
+        Nothing changes when the lease has already expired and passed to another worker.
+        """
+        now = time.time()
+        dead = not retry or job['attempts'] >= self.max_attempts
+        status, visible_at = (DEAD, now) if dead else (READY, now + self.retry_delay * job['attempts'])
+
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = ?, visible_at = ?, last_error = ?, lease_owner = NULL, "
+                         "updated_at = ? WHERE id = ? AND lease_owner = ?",
+                         (status, visible_at, str(error), now, job['id'], job['lease_owner']))
+
+        if dead:
+            logger.error(f"Job {job['id']} ({job['ticker']}) dead-lettered after {job['attempts']} attempts: {error}")
+        else:
+            logger.warning(f"Job {job['id']} ({job['ticker']}) failed, retrying: {error}")
+
+    def release(self, job, delay=0):
+        """Return a leased job to the queue without counting its attempt, visible again after ``delay`` seconds"""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("UPDATE jobs SET status = ?, attempts = attempts - 1, visible_at = ?, lease_owner = NULL, "
+                         "updated_at = ? WHERE id = ? AND lease_owner = ? AND status = ?",
+                         (READY, now + delay, now, job['id'], job['lease_owner'], LEASED))
+
+        logger.info(f"Job {job['id']} ({job['ticker']}) released, visible again in {delay:.0f}s")
+
+    def counts(self):
+        """Number of jobs in each state"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        return {status: 0 for status in (READY, LEASED, DONE, DEAD)} | {row[0]: row[1] for row in rows}
+
+    def dead_letters(self):
+        """Dead-lettered jobs with their last error"""
+        with self._transaction() as conn:
+            rows = conn.execute("SELECT id, ticker, output, attempts, last_error FROM jobs WHERE status = ? "
+                                "ORDER BY id", (DEAD,)).fetchall()
+        return [dict(row) for row in rows]